@@ -0,0 +1,232 @@
+'''
+American options on the underlyings of generalised_bs.BS
+(equity with discrete dividends, index or currency with a yield, futures)
+
+American   - Cox-Ross-Rubinstein binomial lattice, prices and the delta,
+             gamma and theta read off its first nodes
+barone_adesi_whaley - quadratic approximation, prices only, much faster;
+             calls paying discrete dividends before expiry are priced on
+             the lattice
+
+Both take NumPy arrays (or broadcastable scalars) in the same units as BS.
+Discrete dividends follow the escrowed model of generalised_bs.BS: the tree
+is built on the spot less the dividends PV, and a node is exercised against
+its value plus the PV of the dividends still to be paid before expiry
+'''
+import numpy as np
+import normdist as norm
+from dividends import DividendSchedule
+from engine import carry_terms, cash_dividends_pv
+
+
+class American:
+    '''
+    American options priced on a binomial lattice
+    Every contract uses the same number of steps, so a whole chain is
+    rolled back together: memory is O(contracts * steps)
+    With grid_days the chain shares one time grid of grid_days-day steps
+    instead: each expiry is rounded to the grid and starts the roll back at
+    its own step, and a dividend paid on a grid day (any whole day for
+    grid_days=1) falls on the nodes of that step
+    Outputs are arrays of the broadcast shape (floats for scalar inputs):
+        call_price, put_price, call_delta, put_delta,
+        call_gamma, put_gamma, call_theta, put_theta (per day)
+    '''
+
+    def __init__(self, spot_price, strike_price, risk_free_rate, exp_time, volatility, div_yield=0.0, dividends=None, is_fut=False, steps=200, grid_days=None):
+
+        if steps < 2:
+            raise ValueError('The lattice needs at least 2 steps')
+        if grid_days is not None and grid_days <= 0:
+            raise ValueError('grid_days must be positive')
+
+        S = np.asarray(spot_price, dtype=float)
+        K = np.asarray(strike_price, dtype=float)
+        r = np.asarray(risk_free_rate, dtype=float) / 100  # to decimals
+        T = np.asarray(exp_time, dtype=float) / 365  # to years
+        sigma = np.asarray(volatility, dtype=float) / 100  # to decimals
+        q = np.asarray(div_yield, dtype=float) / 100  # to decimals
+
+        scalar = all(np.ndim(x) == 0 for x in [S, K, r, T, sigma, q, is_fut])
+
+        S, K, r, T, sigma, q, is_fut = np.broadcast_arrays(S, K, r, T, sigma, q, is_fut)
+        shape = S.shape
+        S, K, r, T, sigma, q, is_fut = [np.ravel(x) for x in [S, K, r, T, sigma, q, is_fut]]
+
+        if isinstance(dividends, DividendSchedule):
+            dividends.check(risk_free_rate, 'continuous')
+
+        # sigma == 0 or T == 0: intrinsic value, as in BS._price
+        expired = (sigma == 0) | (T == 0)
+        sigma = np.where(expired, 1.0, sigma)
+
+        if grid_days is None:
+            T = np.where(expired, 1.0, T)
+            dt = T / steps
+            expiry = np.full(T.shape, steps)
+        else:
+            # expiry step of each contract on the shared grid
+            dt = np.full(T.shape, grid_days / 365)
+            expiry = np.where(expired, 2, np.rint(T / dt)).astype(int)
+            if np.any(expiry < 2):
+                raise ValueError('Every contract needs at least 2 steps of grid_days')
+            steps = int(expiry.max())
+            T = expiry * dt
+
+        cash_div, q = carry_terms(r, T, q, dividends, is_fut)[:2]
+
+        up = np.exp(sigma * np.sqrt(dt))
+        p = (np.exp((r - q) * dt) - 1 / up) / (up - 1 / up)
+        disc = np.exp(-r * dt)
+
+        # nodes of step j are (S - escrow) * up**(2i - j), i = 0..j
+        nodes = (S - cash_div)[:, None] * up[:, None]**(2 * np.arange(steps + 1) - steps)
+        sign = np.array([1.0, -1.0])[:, None, None]  # call, put
+        values = np.maximum(sign * (nodes - K[:, None]), 0.0)
+
+        first = {}
+        for j in range(steps - 1, -1, -1):
+            nodes = nodes[:, :-1] * up[:, None]
+            # PV at the step of the dividends paid after it, up to expiry
+            escrow = np.exp(r * j * dt) * (cash_div - cash_dividends_pv(r, j * dt, dividends))
+            values = disc[:, None] * (p[:, None] * values[..., 1:] + (1 - p[:, None]) * values[..., :-1])
+            values = np.maximum(values, sign * (nodes + (escrow - K)[:, None]))
+            if grid_days is not None:
+                # contracts expiring at this step start from their payoff
+                values = np.where((expiry == j)[:, None], np.maximum(sign * (nodes - K[:, None]), 0.0), values)
+            if j < 3:
+                first[j] = [nodes, values]
+
+        [s1, v1], [s2, v2], v0 = first[1], first[2], first[0][1][..., 0]
+
+        delta = (v1[..., 1] - v1[..., 0]) / (s1[:, 1] - s1[:, 0])
+        delta_up = (v2[..., 2] - v2[..., 1]) / (s2[:, 2] - s2[:, 1])
+        delta_down = (v2[..., 1] - v2[..., 0]) / (s2[:, 1] - s2[:, 0])
+        gamma = (delta_up - delta_down) / (0.5 * (s2[:, 2] - s2[:, 0]))
+        theta = (v2[..., 1] - v0) / (2 * dt) / 365
+
+        intrinsic = np.maximum(sign[..., 0] * (S - K), 0.0)
+        v0 = np.where(expired, intrinsic, v0)
+        delta = np.where(expired, np.where(sign[..., 0] * (S - K) > 0, sign[..., 0], 0.0), delta)
+        gamma = np.where(expired, 0.0, gamma)
+        theta = np.where(expired, 0.0, theta)
+
+        outputs = {'call_price': v0[0], 'put_price': v0[1],
+                   'call_delta': delta[0], 'put_delta': delta[1],
+                   'call_gamma': gamma[0], 'put_gamma': gamma[1],
+                   'call_theta': theta[0], 'put_theta': theta[1]}
+
+        for name, value in outputs.items():
+            self.__dict__[name] = float(value[0]) if scalar else value.reshape(shape)
+
+
+def barone_adesi_whaley(spot_price, strike_price, risk_free_rate, exp_time, volatility, div_yield=0.0, dividends=None, is_fut=False, tol=1e-8, max_iter=100, steps=200):
+    '''
+    Returns the American option prices: [Call prices, Put prices]
+    Barone-Adesi and Whaley (1987) approximation; discrete dividends are
+    escrowed out of the spot and then priced without a yield, except for
+    calls paying one before expiry, which can be exercised just ahead of it
+    and are priced on an American lattice of steps steps instead
+    '''
+    S = np.asarray(spot_price, dtype=float)
+    K = np.asarray(strike_price, dtype=float)
+    r = np.asarray(risk_free_rate, dtype=float) / 100  # to decimals
+    T = np.asarray(exp_time, dtype=float) / 365  # to years
+    sigma = np.asarray(volatility, dtype=float) / 100  # to decimals
+    q = np.asarray(div_yield, dtype=float) / 100  # to decimals
+
+    if isinstance(dividends, DividendSchedule):
+        dividends.check(risk_free_rate, 'continuous')
+
+    cash_div, q = carry_terms(r, T, q, dividends, is_fut)[:2]
+    S, K, r, T, sigma, q = np.broadcast_arrays(S - cash_div, K, r, T, sigma, q)
+
+    expired = (sigma == 0) | (T == 0)
+    T = np.where(expired, 1.0, T)
+    sigma = np.where(expired, 1.0, sigma)
+
+    b = r - q  # cost of carry
+    var_T = sigma**2 * T
+    n = 2 * b / sigma**2
+    # 2r / (sigma**2 * (1 - exp(-rT))), 2 / (sigma**2 * T) when r == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        m_k = np.where(r == 0, 2 / var_T, 2 * r / (sigma**2 * -np.expm1(-r * T)))
+
+    root = np.sqrt((n - 1)**2 + 4 * m_k)
+    q_call = (1 - n + root) / 2
+    q_put = (1 - n - root) / 2
+    carry = np.exp((b - r) * T)
+
+    call, put = _european(S, K, r, T, sigma, b)
+
+    # critical spot above which the call is exercised, below which the put is
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        root_inf = np.sqrt((n - 1)**2 + 8 * r / sigma**2)
+        call_inf = K / (1 - 2 / (1 - n + root_inf))
+        put_inf = K / (1 - 2 / (1 - n - root_inf))
+        sigma_root_T = np.sqrt(var_T)
+
+        h_call = -(b * T + 2 * sigma_root_T) * K / (call_inf - K)
+        h_put = (b * T - 2 * sigma_root_T) * K / (K - put_inf)
+        call_star = K + (call_inf - K) * (1 - np.exp(h_call))
+        put_star = put_inf + (K - put_inf) * np.exp(h_put)
+
+        for _ in range(max_iter):
+            d1 = (np.log(call_star / K) + (b + sigma**2 / 2) * T) / sigma_root_T
+            euro = _european(call_star, K, r, T, sigma, b)[0]
+            rhs = euro + (1 - carry * norm.array_cdf(d1)) * call_star / q_call
+            slope = carry * norm.array_cdf(d1) * (1 - 1 / q_call) + \
+                (1 - carry * norm.array_pdf(d1) / sigma_root_T) / q_call
+            call_done = np.abs(call_star - K - rhs) <= tol * K
+            call_star = np.where(call_done, call_star, (K + rhs - slope * call_star) / (1 - slope))
+
+            d1 = (np.log(put_star / K) + (b + sigma**2 / 2) * T) / sigma_root_T
+            euro = _european(put_star, K, r, T, sigma, b)[1]
+            rhs = euro - (1 - carry * norm.array_cdf(-d1)) * put_star / q_put
+            slope = -carry * norm.array_cdf(-d1) * (1 - 1 / q_put) - \
+                (1 + carry * norm.array_pdf(-d1) / sigma_root_T) / q_put
+            put_done = np.abs(K - put_star - rhs) <= tol * K
+            put_star = np.where(put_done, put_star, (K - rhs + slope * put_star) / (1 + slope))
+
+            if np.all(call_done | (b >= r)) and np.all(put_done | (r <= 0)):
+                break
+
+        d1 = (np.log(call_star / K) + (b + sigma**2 / 2) * T) / sigma_root_T
+        a_call = call_star / q_call * (1 - carry * norm.array_cdf(d1))
+        american_call = np.where(S < call_star, call + a_call * (S / call_star)**q_call, S - K)
+
+        d1 = (np.log(put_star / K) + (b + sigma**2 / 2) * T) / sigma_root_T
+        a_put = -put_star / q_put * (1 - carry * norm.array_cdf(-d1))
+        american_put = np.where(S > put_star, put + a_put * (S / put_star)**q_put, K - S)
+
+    # no early exercise: calls without a positive yield, puts at rates <= 0
+    call = np.where(b >= r, call, american_call)
+    put = np.where(r <= 0, put, american_put)
+
+    call = np.where(expired, np.maximum(0.0, S + cash_div - K), call)
+    put = np.where(expired, np.maximum(0.0, K - S - cash_div), put)
+
+    lattice = (cash_div > 0) & ~expired
+    if np.any(lattice):
+        *args, fut, lattice = np.broadcast_arrays(spot_price, strike_price, risk_free_rate, exp_time,
+                                                  volatility, div_yield, is_fut, lattice)
+        call = np.array(np.broadcast_to(call, lattice.shape))
+        call[lattice] = American(*[x[lattice] for x in args], dividends=dividends,
+                                 is_fut=fut[lattice], steps=steps).call_price
+
+    return [call, put]
+
+
+def _european(S, K, r, T, sigma, b):
+    '''Returns the European prices with cost of carry b: [Call prices, Put prices]'''
+    sigma_root_T = sigma * np.sqrt(T)
+    d1 = (np.log(S / K) + (b + sigma**2 / 2) * T) / sigma_root_T
+    d2 = d1 - sigma_root_T
+
+    pv_S = S * np.exp((b - r) * T)
+    pv_K = K * np.exp(-r * T)
+
+    call = pv_S * norm.array_cdf(d1) - pv_K * norm.array_cdf(d2)
+    put = pv_K * norm.array_cdf(-d2) - pv_S * norm.array_cdf(-d1)
+
+    return [call, put]
@@ -1,8 +1,44 @@
-from PyQt5 import QtWidgets
+from PyQt5 import QtCore, QtWidgets
 from mydesign import Ui_MainWindow
 import sys
 import datetime
-from generalised_bs import BS
+from cache import PricingCache
+from dates import days_to_date
+
+# quiet time after the last edit before recalculating, ms
+DEBOUNCE_INTERVAL = 300
+
+# output fields of the window, BS attribute of each
+OUTPUTS = {'callPrice': 'call_price', 'putPrice': 'put_price',
+           'callDelta': 'call_delta', 'putDelta': 'put_delta',
+           'gamma': 'gamma', 'vega': 'vega',
+           'callRho': 'call_rho', 'putRho': 'put_rho',
+           'callTheta': 'call_theta', 'putTheta': 'put_theta',
+           'd1': 'd1', 'd2': 'd2'}
+
+
+class PricingSignals(QtCore.QObject):
+    finished = QtCore.pyqtSignal(int, object)
+    failed = QtCore.pyqtSignal(int, str)
+
+
+class PricingWorker(QtCore.QRunnable):
+    '''Prices one request of the window on a QThreadPool thread'''
+
+    def __init__(self, cache, request_id, kwargs):
+        super(PricingWorker, self).__init__()
+        self.cache = cache
+        self.request_id = request_id
+        self.kwargs = kwargs
+        self.signals = PricingSignals()
+
+    def run(self):
+        try:
+            bs = self.cache.price(**self.kwargs)
+        except Exception as error:
+            self.signals.failed.emit(self.request_id, str(error))
+        else:
+            self.signals.finished.emit(self.request_id, bs)
 
 
 class mywindow(QtWidgets.QMainWindow):
@@ -15,20 +51,53 @@ class mywindow(QtWidgets.QMainWindow):
             self.__dict__[i] = ''
 
         self.dividends = []
+        self.cache = PricingCache()
+
+        # results of requests older than the last one are dropped
+        self.request_id = 0
+        self.contract = None
+        self.pool = QtCore.QThreadPool.globalInstance()
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(DEBOUNCE_INTERVAL)
+        self.timer.timeout.connect(self.calculateButtonClicked)
+
+        for edit in [self.ui.spotPrice, self.ui.strikePrice, self.ui.riskFreeRate,
+                     self.ui.divYield, self.ui.volatility]:
+            edit.textChanged.connect(self.scheduleCalculation)
+        for date in [self.ui.startDate, self.ui.expDate]:
+            date.dateChanged.connect(self.scheduleCalculation)
+        self.ui.undTypeBox.currentIndexChanged.connect(self.scheduleCalculation)
 
         self.ui.calculateButton.clicked.connect(self.calculateButtonClicked)
+
+        self.chainButton = QtWidgets.QPushButton('Option Chain', self.ui.centralwidget)
+        self.chainButton.setGeometry(QtCore.QRect(480, 380, 230, 30))
+        self.chainButton.clicked.connect(self.chainButtonClicked)
+
         self.ui.divAddButton.clicked.connect(self.divAddButtonClicked)
         self.ui.divBox.activated[str].connect(self.divOnActivated)
         self.ui.divDeleteButton.clicked.connect(self.divDeleteButtonClicked)
         self.ui.divAllDeleteButton.clicked.connect(
             self.divAllDeleteButtonClicked)
         self.ui.undTypeBox.activated[str].connect(self.undActivated)
+        for button in [self.ui.divAddButton, self.ui.divDeleteButton,
+                       self.ui.divAllDeleteButton]:
+            button.clicked.connect(self.scheduleCalculation)
 
         self.ui.divYieldLabel.setDisabled(True)
         self.ui.divYield.setDisabled(True)
 
+    def scheduleCalculation(self):
+        '''Recalculates once the inputs stop changing for DEBOUNCE_INTERVAL'''
+        self.timer.start()
+
     def calculateButtonClicked(self):
+        self.timer.stop()
+        self.request_id += 1
         self.info_text = ''
+        self.contract = None
 
         self.underlying_type = self.ui.undTypeBox.currentText()
         self.info_text += f"Underlying Type: {self.underlying_type}\n"
@@ -67,63 +136,72 @@ class mywindow(QtWidgets.QMainWindow):
             self.info_text += f"Start Date : {self.ui.startDate.text()}\nExpiration Date: {self.ui.expDate.text()}\nExpires in {self.exp_time} days\n"
 
         else:
-            self.info_text += "Check the expiration date. It must be later than start date\n"
+            self.info_text += "CHECK the expiration date. It must be later than start date\n"
 
         if self.dividends:
             self.info_text += "Including dividents payments"
 
         self.ui.infoText.setText(self.info_text)
         if 'CHECK' in self.info_text:
+            # no results for inputs that are not valid
+            self.clearResults()
             return
 
+        kwargs = {'spot_price': self.spot_price,
+                  'strike_price': self.strike_price,
+                  'risk_free_rate': self.risk_free_rate,
+                  'exp_time': self.exp_time,
+                  'volatility': self.volatility}
+
         if self.underlying_type == 'Equity':
-            bs = BS(self.spot_price,
-                    self.strike_price,
-                    self.risk_free_rate,
-                    self.exp_time,
-                    self.volatility,
-                    dividends=self.dividends)
+            kwargs['dividends'] = [list(div) for div in self.dividends]
 
         elif self.underlying_type in ['Currency', 'Index']:
-            bs = BS(self.spot_price,
-                    self.strike_price,
-                    self.risk_free_rate,
-                    self.exp_time,
-                    self.volatility,
-                    div_yield=self.dividend_yield)
+            kwargs['div_yield'] = self.dividend_yield
 
         else:
-            bs = BS(self.spot_price,
-                    self.strike_price,
-                    self.risk_free_rate,
-                    self.exp_time,
-                    self.volatility,
-                    is_fut=True)
+            kwargs['is_fut'] = True
+
+        self.contract = kwargs
+        worker = PricingWorker(self.cache, self.request_id, kwargs)
+        worker.signals.finished.connect(self.pricingFinished)
+        worker.signals.failed.connect(self.pricingFailed)
+        self.pool.start(worker)
+
+    def pricingFinished(self, request_id, bs):
+        if request_id != self.request_id:
+            return
 
-        self.ui.callPrice.setText(str(round(bs.call_price, 6)))
-        self.ui.putPrice.setText(str(round(bs.put_price, 6)))
+        for field, attr in OUTPUTS.items():
+            getattr(self.ui, field).setText(str(round(getattr(bs, attr), 6)))
 
-        self.ui.callDelta.setText(str(round(bs.call_delta, 6)))
-        self.ui.putDelta.setText(str(round(bs.put_delta, 6)))
+    def clearResults(self):
+        for field in OUTPUTS:
+            getattr(self.ui, field).clear()
 
-        self.ui.gamma.setText(str(round(bs.gamma, 6)))
-        self.ui.vega.setText(str(round(bs.vega, 6)))
+    def chainButtonClicked(self):
+        self.calculateButtonClicked()
+        if self.contract is None:
+            return
+
+        # imported here so the single-contract window starts without it
+        from chain_view import ChainWindow
 
-        self.ui.callRho.setText(str(round(bs.call_rho, 6)))
-        self.ui.putRho.setText(str(round(bs.put_rho, 6)))
+        ChainWindow(self.contract, self).show()
 
-        self.ui.callTheta.setText(str(round(bs.call_theta, 6)))
-        self.ui.putTheta.setText(str(round(bs.put_theta, 6)))
+    def pricingFailed(self, request_id, message):
+        if request_id != self.request_id:
+            return
 
-        self.ui.d1.setText(str(round(bs.d1, 6)))
-        self.ui.d2.setText(str(round(bs.d2, 6)))
+        self.clearResults()
+        self.ui.infoText.setText(f"{self.info_text}\nCHECK the inputs: {message}")
 
     def divAddButtonClicked(self):
         div_pay, div_time = '', ''
         self.info_text = ''
         try:
-            div_pay = float(eval(self.ui.divPayment.text().replace(',', '.')))
-        except:
+            div_pay = float(self.ui.divPayment.text().replace(',', '.'))
+        except ValueError:
             self.info_text += "Check divident payments\n"
 
         if days_to_date(self.ui.startDate.text(), self.ui.divDate.text()) > 0:
@@ -202,7 +280,11 @@ class mywindow(QtWidgets.QMainWindow):
             self.ui.divYield.setDisabled(True)
 
     def divDeleteButtonClicked(self):
-        div_pay = float(eval(self.ui.divPayment.text().replace(',', '.')))
+        try:
+            div_pay = float(self.ui.divPayment.text().replace(',', '.'))
+        except ValueError:
+            self.ui.infoText.setText("Check divident payments")
+            return
         div_time = days_to_date(
             self.ui.startDate.text(), self.ui.divDate.text())
 
@@ -224,26 +306,24 @@ class mywindow(QtWidgets.QMainWindow):
         self.ui.infoText.setText("All dividend payments has been removed")
 
 
-def days_to_date(date_str1, date_str2):
-    date1 = datetime.datetime.strptime(date_str1, "%d.%m.%Y")
-    date2 = datetime.datetime.strptime(date_str2, "%d.%m.%Y")
-    diff = date2 - date1
-
-    return int(diff.days)
-
-
 def valid_input(inputLabel, inputEdit, info_text):
     try:
-        var = float(eval(inputEdit.text()))
+        var = float(inputEdit.text().replace(',', '.'))
         info_text += f"{inputLabel.text()}: {var}\n"
         return var, info_text
-    except:
+    except ValueError:
         info_text += f"CHECK the {inputLabel.text()}\n"
         return None, info_text
 
 
-app = QtWidgets.QApplication(sys.argv)
-application = mywindow()
-application.show()
+def main():
+    app = QtWidgets.QApplication(sys.argv)
+    application = mywindow()
+    application.show()
+
+    sys.exit(app.exec())
+
+
+if __name__ == '__main__':
+    main()
 
-sys.exit(app.exec())
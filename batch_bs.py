@@ -0,0 +1,119 @@
+import numpy as np
+import normdist as norm
+from engine import adjust_spot, evaluate, forward_terms
+
+
+# outputs computed when they are first accessed
+HIGHER_ORDER = {'_normal': ['_N_d1', '_N_minus_d1', '_n_d1'],
+                '_vanna': ['vanna'],
+                '_volga': ['volga'],
+                '_charm': ['call_charm', 'put_charm'],
+                '_speed': ['speed'],
+                '_zomma': ['zomma'],
+                '_color': ['color']}
+
+
+class BatchBS:
+    '''
+    Vectorized version of generalised_bs.BS for whole option chains
+    Takes NumPy arrays (or broadcastable scalars) in the same units as BS
+    and stores every output as an array of the broadcast shape
+    The higher-order Greeks (HIGHER_ORDER) are computed on first access
+    '''
+
+    def __init__(self, spot_price, strike_price, risk_free_rate, exp_time, volatility, div_yield=0.0, dividends=None, is_fut=False, convention='continuous', precision='float64'):
+
+        # dividends is one list of [amount, days] (or a DividendSchedule)
+        # shared by the whole chain, discounted as set by convention
+        # (engine.CONVENTIONS); convention='bs' prices as bs.BS does
+        # precision='float32' halves the memory, see engine.FLOAT32_BOUNDS
+
+        self.__dict__.update(forward_terms(spot_price, strike_price, risk_free_rate, exp_time,
+                                           volatility, div_yield, dividends, is_fut, convention,
+                                           precision))
+
+        self._evaluate()
+
+    @classmethod
+    def from_terms(cls, S, K, r, T, sigma, q, pv_div, pv_K, sigma_root_T):
+        '''
+        Builds a BatchBS from already adjusted terms (decimals and years,
+        S is the adjusted spot), evaluating only d1, d2, the price and Greeks
+        '''
+        bs = cls.__new__(cls)
+        bs.S, bs.K, bs.r, bs.T, bs.sigma, bs.q = S, K, r, T, sigma, q
+        bs.pv_div, bs.pv_K, bs.sigma_root_T = pv_div, pv_K, sigma_root_T
+        bs._evaluate()
+
+        return bs
+
+    def __getattr__(self, name):
+        '''Computes the higher-order Greeks when they are first accessed'''
+        for method, names in HIGHER_ORDER.items():
+            if name in names:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    values = getattr(self, method)()
+                if len(names) == 1:
+                    values = [values]
+                self.__dict__.update(zip(names, values))
+
+                return self.__dict__[name]
+
+        raise AttributeError(name)
+
+    def _evaluate(self):
+        '''Computes d1, d2, the price and Greeks from the adjusted terms'''
+        self.__dict__.update(evaluate(self.S, self.K, self.r, self.T, self.sigma, self.q,
+                                      self.pv_div, self.pv_K, self.sigma_root_T,
+                                      self.__dict__.get('log_moneyness')))
+
+    def _normal(self):
+        '''Returns the normal terms the higher-order Greeks share: [N(d1), N(-d1), n(d1)]'''
+        return [norm.array_cdf(self.d1), norm.array_cdf(-self.d1), norm.array_pdf(self.d1)]
+
+    # higher-order Greeks: per 1% of volatility and per day, like vega and theta
+
+    def _vanna(self):
+        '''Returns the option vannas'''
+        vanna = -self.pv_div * self._n_d1 * self.d2 / self.sigma / 100
+
+        return np.where(self.expired, 0.0, vanna)
+
+    def _volga(self):
+        '''Returns the option volgas (vommas)'''
+        volga = self.S * self._n_d1 * np.sqrt(self.T) * self.d1 * self.d2 / self.sigma / 100**2
+
+        return np.where(self.expired, 0.0, volga)
+
+    def _charm(self):
+        '''Returns the option charms: [Call charms, Put charms]'''
+        decay = self.pv_div * self._n_d1 * (2 * (self.r - self.q) * self.T - self.d2 *
+                                            self.sigma_root_T) / (2 * self.T * self.sigma_root_T)
+
+        call = self.q * self.pv_div * self._N_d1 - decay
+        put = -self.q * self.pv_div * self._N_minus_d1 - decay
+
+        call = np.where(self.expired, 0.0, call)
+        put = np.where(self.expired, 0.0, put)
+
+        return [call / 365, put / 365]
+
+    def _speed(self):
+        '''Returns the option speeds'''
+        speed = -self.gamma * self.pv_div / self.S * (self.d1 / self.sigma_root_T + 1)
+
+        return np.where(self.expired, 0.0, speed)
+
+    def _zomma(self):
+        '''Returns the option zommas'''
+        zomma = self.gamma * (self.d1 * self.d2 - 1) / self.sigma / 100
+
+        return np.where(self.expired, 0.0, zomma)
+
+    def _color(self):
+        '''Returns the option colors'''
+        color = self.gamma / (2 * self.T) * (
+            2 * self.q * self.T + 1 + self.d1 * (2 * (self.r - self.q) * self.T -
+                                                 self.d2 * self.sigma_root_T) / self.sigma_root_T)
+
+        return np.where(self.expired, 0.0, color / 365)
@@ -0,0 +1,536 @@
+'''
+Benchmarks for the pricing modules
+
+    python benchmark.py startup
+    python benchmark.py speed [--save] [--compare COMMIT]
+    python benchmark.py accuracy [--update]
+    python benchmark.py memory
+
+startup  - imports the pricing core in a fresh interpreter and fails if it
+           takes longer than STARTUP_BUDGET seconds or loads a heavy module
+speed    - times bs.BS and generalised_bs.BS (construction, each output on
+           its own, dividends) and BatchBS on SPEED_CONTRACTS random contracts.
+           --save stores the timings in RESULTS_FILE under the current commit,
+           --compare fails if a case got REGRESSION_THRESHOLD times slower
+           than under COMMIT
+accuracy - compares both models with the golden values in GOLDEN_FILE
+           (edge cases included, errors are recorded by their type) and checks
+           that the normal distribution backends agree (normdist.TOLERANCE
+           and RELATIVE_TOLERANCE), that BatchBS reproduces both scalar
+           models (convention='bs' for bs.BS, and a convention='bs'
+           ScenarioGrid given a DividendSchedule), the engine
+           backends when Numba is installed (BatchBS to ENGINE_TOLERANCE,
+           ImpliedVol to IMPLIED_VOL_TOLERANCE), and that float32 BatchBS stays
+           within engine.FLOAT32_BOUNDS. --update rewrites the golden
+           values from the current code
+memory   - measures with tracemalloc the bytes per priced contract held by
+           generalised_bs.BS objects and by the BSResult of price(), and
+           fails if a BSResult takes more than RESULT_MEMORY_BUDGET, or if
+           the peak memory of a float32 ScenarioGrid is more than
+           engine.FLOAT32_PEAK times that of float64 (on both engine backends
+           when Numba is installed)
+'''
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import bs
+import generalised_bs
+import normdist as norm
+from dividends import DividendSchedule
+from result import FIELDS
+
+# modules a bare pricing worker imports
+CORE_MODULES = ['bs', 'generalised_bs', 'scalar_engine', 'normdist', 'result', 'dates']
+
+# modules the core must only load on the code path that needs them
+HEAVY_MODULES = ['numpy', 'scipy', 'PyQt5']
+
+STARTUP_BUDGET = 0.05  # seconds, on top of a bare interpreter start
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(HERE, 'benchmarks.json')
+GOLDEN_FILE = os.path.join(HERE, 'golden.json')
+
+SPEED_CONTRACTS = 2000
+SEED = 90
+REGRESSION_THRESHOLD = 1.25  # slowdown ratio
+ACCURACY_TOLERANCE = 1e-9  # relative, absolute below 1
+ENGINE_TOLERANCE = 1e-12  # relative, absolute below 1
+IMPLIED_VOL_TOLERANCE = 1e-5  # vol points, 10 times the default ImpliedVol tol
+RESULT_MEMORY_BUDGET = 450  # bytes per BSResult, floats included
+
+MODELS = ['bs', 'generalised']
+
+# output each lazy speed case accesses
+OUTPUTS = {'price': 'call_price', 'delta': 'call_delta', 'theta': 'call_theta',
+           'rho': 'call_rho', 'vega': 'vega', 'gamma': 'gamma'}
+
+QUARTERLY = [[0.5, 30], [0.5, 120], [0.5, 210], [0.5, 300]]
+
+# inputs in the units of generalised_bs.BS, q and is_fut ignored by bs.BS
+GOLDEN_CASES = {
+    'atm': dict(S=100, K=100, r=5, T=365, sigma=20),
+    'market': dict(S=100, K=105, r=2.5, T=90, sigma=26.07),
+    'short_expiry': dict(S=100, K=101, r=2.5, T=1, sigma=15),
+    'long_expiry': dict(S=100, K=90, r=4, T=3650, sigma=35),
+    'high_vol': dict(S=100, K=100, r=3, T=180, sigma=250),
+    'low_vol': dict(S=100, K=100, r=3, T=180, sigma=0.5),
+    'deep_itm': dict(S=100, K=10, r=3, T=180, sigma=20),
+    'deep_otm': dict(S=100, K=1000, r=3, T=180, sigma=20),
+    'div_yield': dict(S=100, K=95, r=3, T=200, sigma=30, q=4),
+    'future': dict(S=100, K=95, r=3, T=200, sigma=30, is_fut=True),
+    'dividends': dict(S=100, K=95, r=3, T=365, sigma=30, dividends=QUARTERLY),
+    'dividends_after_expiry': dict(S=100, K=95, r=3, T=20, sigma=30, dividends=QUARTERLY),
+    'zero_rate': dict(S=100, K=100, r=0, T=90, sigma=20),
+    'expired': dict(S=100, K=95, r=3, T=0, sigma=30),
+    'zero_vol': dict(S=100, K=95, r=3, T=90, sigma=0),
+    'zero_strike': dict(S=100, K=0, r=3, T=90, sigma=30),
+}
+
+# arguments of the normal distribution backend check
+NORM_POINTS = [i / 8 for i in range(-320, 321)]
+
+
+def startup(repeat=5):
+    '''
+    Returns [best import time of the core in seconds, heavy modules it loaded]
+    Each run is a fresh interpreter, a bare interpreter start is subtracted
+    '''
+    script = (f"import sys; import {', '.join(CORE_MODULES)}; "
+              f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+
+    best = float('inf')
+    loaded = []
+    for _ in range(repeat):
+        base = _run([sys.executable, '-c', 'pass'])[0]
+        elapsed, output = _run([sys.executable, '-c', script])
+        best = min(best, elapsed - base)
+        loaded = [m for m in output.strip().split(',') if m]
+
+    return [best, loaded]
+
+
+def speed(contracts=SPEED_CONTRACTS, repeat=5):
+    '''Returns {case: best time per contract in seconds}'''
+    rng = random.Random(SEED)
+    inputs = [_random_contract(rng) for _ in range(contracts)]
+
+    timings = {}
+    for model in MODELS:
+        convention = 'compound' if model == 'bs' else 'continuous'
+        schedules = [DividendSchedule(QUARTERLY, c['r'], convention) for c in inputs]
+
+        cases = {'construct': lambda c, i: _build(model, c),
+                 'dividends': lambda c, i: _build(model, c, QUARTERLY),
+                 'schedule': lambda c, i: _build(model, c, schedules[i])}
+        for output, name in OUTPUTS.items():
+            cases[output] = lambda c, i, name=name: getattr(_build(model, c, lazy=True), name)
+
+        for case, func in cases.items():
+            timings[f'{model}.{case}'] = _best(
+                lambda: [func(c, i) for i, c in enumerate(inputs)], repeat) / contracts
+
+    import numpy as np
+    from batch_bs import BatchBS
+
+    columns = {key: np.array([c[key] for c in inputs]) for key in ['S', 'K', 'r', 'T', 'sigma', 'q']}
+    args = [columns[key] for key in ['S', 'K', 'r', 'T', 'sigma', 'q']]
+    timings['batch.construct'] = _best(lambda: BatchBS(*args), repeat) / contracts
+    timings['batch.dividends'] = _best(lambda: BatchBS(*args, dividends=QUARTERLY), repeat) / contracts
+
+    return timings
+
+
+def accuracy():
+    '''
+    Returns [{case: outputs} of both models, {normal distribution backend:
+    [absolute, relative difference]}, {model: largest difference of BatchBS},
+    [largest engine backend difference of BatchBS, of ImpliedVol] (None
+    without Numba), {output: float32 error}]
+    Outputs are {field: value}, or {'error': exception type} if BS raises
+    '''
+    values = {}
+    for model in MODELS:
+        for case, inputs in GOLDEN_CASES.items():
+            try:
+                obj = _build(model, inputs, inputs.get('dividends'))
+                values[f'{model}.{case}'] = {name: getattr(obj, name) for name in FIELDS}
+            except Exception as error:
+                values[f'{model}.{case}'] = {'error': type(error).__name__}
+
+    return [values, norm.backend_differences(NORM_POINTS), _model_differences(),
+            _engine_difference(), _float32_errors()]
+
+
+def memory(contracts=SPEED_CONTRACTS):
+    '''
+    Returns {'bs': bytes per BS object, 'result': bytes per BSResult}, floats
+    included, and 'float32_peak': {engine backend: float32 / float64 peak of a grid}
+    '''
+    rng = random.Random(SEED)
+    inputs = [_random_contract(rng) for _ in range(contracts)]
+
+    def held(func):
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            kept = [func(c) for c in inputs]
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        del kept
+
+        return (after - before) / contracts
+
+    return {'bs': held(lambda c: _build('generalised', c)),
+            'result': held(lambda c: _build('generalised', c).result()),
+            'float32_peak': _grid_peaks()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks for the pricing modules')
+    parser.add_argument('suite', choices=['startup', 'speed', 'accuracy', 'memory'])
+    parser.add_argument('--save', action='store_true', help='store the speed results')
+    parser.add_argument('--compare', metavar='COMMIT', help='compare speed with a stored commit')
+    parser.add_argument('--update', action='store_true', help='rewrite the golden values')
+    args = parser.parse_args(argv)
+
+    if args.suite == 'startup':
+        elapsed, loaded = startup()
+        print(f'core import time: {elapsed * 1000:.1f} ms (budget {STARTUP_BUDGET * 1000:.0f} ms)')
+        if loaded:
+            print(f"heavy modules loaded at import: {', '.join(loaded)}")
+
+        if loaded or elapsed > STARTUP_BUDGET:
+            sys.exit(1)
+
+    elif args.suite == 'speed':
+        timings = speed()
+        stored = _load(RESULTS_FILE)
+        reference = stored.get(args.compare, {}) if args.compare else {}
+        if args.compare and not reference:
+            sys.exit(f'No stored results for {args.compare} in {RESULTS_FILE}')
+
+        slower = []
+        for case, elapsed in timings.items():
+            line = f'{case:<24}{elapsed * 1e6:10.2f} us'
+            if case in reference:
+                ratio = elapsed / reference[case]
+                line += f'{ratio:8.2f}x'
+                if ratio > REGRESSION_THRESHOLD:
+                    slower.append(case)
+            print(line)
+
+        if args.save:
+            commit = _commit()
+            stored[commit] = timings
+            _dump(RESULTS_FILE, stored)
+            print(f'saved as {commit}')
+
+        if slower:
+            print(f"slower than {args.compare}: {', '.join(slower)}")
+            sys.exit(1)
+
+    elif args.suite == 'accuracy':
+        values, norm_diff, model_diff, engine_diff, float32_errors = accuracy()
+        loose_norm = []
+        for backend, [absolute, relative] in norm_diff.items():
+            print(f'normal distribution backend {backend} differs by {absolute:.1e} '
+                  f'(relative {relative:.1e}) at most')
+            if absolute > norm.TOLERANCE or relative > norm.RELATIVE_TOLERANCE:
+                loose_norm.append(backend)
+        for model, model_error in model_diff.items():
+            subject, reference = ['ScenarioGrid', 'bs.BS'] if model == 'ScenarioGrid' else ['BatchBS', model]
+            print(f'{subject} differs from {reference} by {model_error:.1e} at most')
+        if engine_diff is not None:
+            print(f'engine backends differ by {engine_diff[0]:.1e} at most, '
+                  f'implied volatilities by {engine_diff[1]:.1e} vol points')
+
+        from engine import FLOAT32_BOUNDS
+        loose = [name for name, error in float32_errors.items() if error > FLOAT32_BOUNDS[name]]
+        for name in loose:
+            print(f'float32 {name} error {float32_errors[name]:.1e} > {FLOAT32_BOUNDS[name]:.0e}')
+        print(f'{len(float32_errors) - len(loose)} of {len(float32_errors)} float32 outputs within bounds')
+
+        if args.update:
+            _dump(GOLDEN_FILE, values)
+            print(f'{len(values)} golden cases written')
+            return
+
+        golden = _load(GOLDEN_FILE)
+        changed = [case for case in golden if not _close(values.get(case), golden[case])]
+        for case in changed:
+            print(f'{case}: {golden[case]} -> {values.get(case)}')
+        print(f'{len(golden) - len(changed)} of {len(golden)} golden cases match')
+
+        engine_diff = engine_diff or [0.0, 0.0]
+        if changed or loose or loose_norm or max(model_diff.values()) > ENGINE_TOLERANCE or \
+                engine_diff[0] > ENGINE_TOLERANCE or engine_diff[1] > IMPLIED_VOL_TOLERANCE:
+            sys.exit(1)
+
+    elif args.suite == 'memory':
+        held = memory()
+        print(f"BS object: {held['bs']:.0f} bytes per contract")
+        print(f"BSResult:  {held['result']:.0f} bytes per contract "
+              f'(budget {RESULT_MEMORY_BUDGET} bytes)')
+
+        from engine import FLOAT32_PEAK
+        for backend, ratio in held['float32_peak'].items():
+            print(f'float32 grid peak ({backend}): {ratio:.2f} of float64 (budget {FLOAT32_PEAK})')
+
+        if held['result'] > RESULT_MEMORY_BUDGET or max(held['float32_peak'].values()) > FLOAT32_PEAK:
+            sys.exit(1)
+
+
+def _build(model, inputs, dividends=None, lazy=False):
+    '''Returns the BS object of one model for the inputs of a case'''
+    c = inputs
+    if model == 'bs':
+        return bs.BS([c['S'], c['K'], c['r'], c['T']], c['sigma'], dividends, lazy=lazy)
+
+    return generalised_bs.BS(c['S'], c['K'], c['r'], c['T'], c['sigma'], c.get('q', 0.0),
+                             dividends, c.get('is_fut', False), lazy=lazy)
+
+
+def _model_differences(contracts=SPEED_CONTRACTS):
+    '''
+    {'bs.BS' and 'generalised_bs.BS': largest relative difference of BatchBS
+    from the scalar model}, on random contracts with dividends before, within and after
+    the expiry, expired, zero volatility and zero strike contracts included, and
+    'ScenarioGrid': of a convention='bs' grid given a DividendSchedule from bs.BS
+    '''
+    import numpy as np
+    from batch_bs import BatchBS
+
+    rng = random.Random(SEED)
+    inputs = [_random_contract(rng) for _ in range(contracts)]
+    inputs += [dict(c, T=0.0) for c in inputs[:10]] + [dict(c, sigma=0.0) for c in inputs[10:20]] + \
+        [dict(c, K=0.0) for c in inputs[20:30]]
+    dividends = [[1.0, -10]] + QUARTERLY + [[1.0, 800]]
+    args = [np.array([c[key] for c in inputs]) for key in ['S', 'K', 'r', 'T', 'sigma', 'q']]
+
+    differences = {}
+    for model in MODELS:
+        if model == 'bs':
+            batch = BatchBS(*args[:5], dividends=dividends, convention='bs')
+        else:
+            batch = BatchBS(*args, dividends=dividends)
+
+        diff = 0.0
+        for i, c in enumerate(inputs):
+            scalar = _build(model, c, dividends)
+            for name in FIELDS:
+                a, b = getattr(scalar, name), float(getattr(batch, name)[i])
+                if a != b and not (a != a and b != b):  # equal infinities, both nan
+                    diff = max(diff, abs(a - b) / max(1.0, abs(a)))
+        differences['bs.BS' if model == 'bs' else 'generalised_bs.BS'] = diff
+
+    from scenarios import ScenarioGrid
+
+    shocks = {'spot_shocks': [-10, 0, 10], 'vol_shocks': [-5, 0, 5], 'days_forward': [0, 15]}
+    diff = 0.0
+    for c in inputs[:50]:
+        schedule = DividendSchedule(dividends, c['r'], 'compound')
+        grid = ScenarioGrid(c['S'], c['K'], c['r'], c['T'], c['sigma'], dividends=schedule,
+                            convention='bs', **shocks)
+        for i, spot in enumerate(shocks['spot_shocks']):
+            for j, vol in enumerate(shocks['vol_shocks']):
+                for k, days in enumerate(shocks['days_forward']):
+                    scalar = bs.BS([c['S'] * (1 + spot / 100), c['K'], c['r'], max(c['T'] - days, 0.0)],
+                                   max(c['sigma'] + vol, 0.0), [[a, t - days] for a, t in dividends])
+                    for name in FIELDS:
+                        a, b = getattr(scalar, name), float(getattr(grid, name)[i, j, k])
+                        if a != b and not (a != a and b != b):
+                            diff = max(diff, abs(a - b) / max(1.0, abs(a)))
+    differences['ScenarioGrid'] = diff
+
+    return differences
+
+
+def _engine_difference(contracts=SPEED_CONTRACTS):
+    '''
+    [largest relative difference of BatchBS, largest difference of ImpliedVol
+    in vol points] between the NumPy and Numba engine backends
+    '''
+    import warnings
+
+    import numpy as np
+    import engine
+    from batch_bs import BatchBS
+    from implied_vol import ImpliedVol
+
+    rng = random.Random(SEED)
+    inputs = [_random_contract(rng) for _ in range(contracts)]
+    # expired and zero volatility contracts too
+    inputs += [dict(c, T=0.0) for c in inputs[:10]] + [dict(c, sigma=0.0) for c in inputs[10:20]]
+    args = [np.array([c[key] for c in inputs]) for key in ['S', 'K', 'r', 'T', 'sigma', 'q']]
+
+    backend = engine.get_backend()
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            if engine.set_backend('numba') != 'numba':
+                return None
+        compiled = BatchBS(*args, dividends=QUARTERLY)
+        compiled_iv = ImpliedVol(compiled.call_price, *args[:4], args[5], QUARTERLY)
+        engine.set_backend('numpy')
+        reference = BatchBS(*args, dividends=QUARTERLY)
+        reference_iv = ImpliedVol(compiled.call_price, *args[:4], args[5], QUARTERLY)
+    finally:
+        engine.set_backend(backend)
+
+    diff = 0.0
+    for name in FIELDS:
+        a, b = getattr(reference, name), getattr(compiled, name)
+        if not np.array_equal(np.isnan(a), np.isnan(b)):
+            return [float('inf'), float('inf')]
+        diff = max(diff, np.nanmax(np.abs(a - b) / np.maximum(1.0, np.abs(a))))
+
+    if not np.array_equal(reference_iv.converged, compiled_iv.converged):
+        return [float(diff), float('inf')]
+    iv_diff = np.nanmax(np.abs(reference_iv.volatility - compiled_iv.volatility), initial=0.0)
+
+    return [float(diff), float(iv_diff)]
+
+
+def _grid_peaks(contracts=10):
+    '''
+    {engine backend: tracemalloc peak of a float32 ScenarioGrid / that of
+    float64}, a grid of contracts x 100 spot x 50 vol x 30 days scenarios
+    '''
+    import warnings
+
+    import numpy as np
+    import engine
+    from scenarios import ScenarioGrid
+
+    rng = random.Random(SEED)
+    inputs = [_random_contract(rng) for _ in range(contracts)]
+    args = [np.array([c[key] for c in inputs]) for key in ['S', 'K', 'r', 'T', 'sigma', 'q']]
+    shocks = {'spot_shocks': np.linspace(-20, 20, 100), 'vol_shocks': np.linspace(-10, 10, 50),
+              'days_forward': np.arange(30)}
+
+    def peak(precision):
+        tracemalloc.start()
+        try:
+            ScenarioGrid(*args, precision=precision, **shocks)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    backend = engine.get_backend()
+    peaks = {}
+    try:
+        for name in engine.BACKENDS:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                if engine.set_backend(name) != name:
+                    continue
+            ScenarioGrid(*args, precision='float32')  # compiles the Numba kernel
+            peaks[name] = peak('float32') / peak('float64')
+    finally:
+        engine.set_backend(backend)
+
+    return peaks
+
+
+def _float32_errors(contracts=SPEED_CONTRACTS):
+    '''{output: largest error of float32 BatchBS against float64}, as engine.FLOAT32_BOUNDS'''
+    import numpy as np
+    from batch_bs import BatchBS
+    from engine import MONEY_OUTPUTS
+
+    rng = random.Random(SEED)
+    inputs = [_random_contract(rng) for _ in range(contracts)]
+    # days to expiry, where theta is the most sensitive, and far strikes
+    inputs += [dict(c, T=rng.uniform(0.01, 1)) for c in inputs[:100]]
+    inputs += [dict(c, K=c['S'] * rng.choice([0.3, 3.0])) for c in inputs[100:200]]
+    args = [np.array([c[key] for c in inputs]) for key in ['S', 'K', 'r', 'T', 'sigma', 'q']]
+
+    errors = {}
+    for dividends in [None, QUARTERLY]:
+        reference = BatchBS(*args, dividends=dividends)
+        single = BatchBS(*args, dividends=dividends, precision='float32')
+        for name in FIELDS:
+            a, b = getattr(reference, name), getattr(single, name).astype(float)
+            scale = np.maximum(1.0, args[0]) if name in MONEY_OUTPUTS else np.maximum(1.0, np.abs(a))
+            errors[name] = max(errors.get(name, 0.0), float(np.nanmax(np.abs(b - a) / scale)))
+
+    return errors
+
+
+def _random_contract(rng):
+    '''Returns the inputs of a random liquid contract'''
+    S = 100 * rng.lognormvariate(0, 0.5)
+
+    return dict(S=S,
+                K=S * rng.uniform(0.7, 1.3),
+                r=rng.uniform(0, 8),
+                T=rng.uniform(1, 730),
+                sigma=rng.uniform(5, 80),
+                q=rng.uniform(0, 5))
+
+
+def _best(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def _close(values, golden):
+    if values is None or values.keys() != golden.keys():
+        return False
+
+    for name, expected in golden.items():
+        value = values[name]
+        if isinstance(expected, str) or expected is None:
+            if value != expected:
+                return False
+        elif expected != expected or abs(expected) == float('inf'):
+            if value != expected and not (value != value and expected != expected):
+                return False
+        elif abs(value - expected) > ACCURACY_TOLERANCE * max(1.0, abs(expected)):
+            return False
+
+    return True
+
+
+def _commit():
+    return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True,
+                          text=True, cwd=HERE).stdout.strip() or 'unknown'
+
+
+def _load(path):
+    if not os.path.exists(path):
+        return {}
+
+    with open(path) as file:
+        return json.load(file)
+
+
+def _dump(path, values):
+    with open(path, 'w') as file:
+        json.dump(values, file, indent=1, sort_keys=True)
+        file.write('\n')
+
+
+def _run(command):
+    start = time.perf_counter()
+    output = subprocess.run(command, capture_output=True, text=True,
+                            check=True, cwd=sys.path[0] or None).stdout
+
+    return [time.perf_counter() - start, output]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+from collections import OrderedDict
+from threading import Lock
+
+from dividends import DividendSchedule
+from generalised_bs import BS
+
+
+class PricingCache:
+    '''
+    Memoizing cache in front of generalised_bs.BS with bounded LRU eviction
+    price() takes the same arguments as BS and returns a result.BSResult,
+    which is immutable and so safe to share between callers
+    '''
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+        self._results = OrderedDict()
+        self._lock = Lock()
+
+    def price(self, spot_price, strike_price, risk_free_rate, exp_time, volatility, div_yield=0.0, dividends=None, is_fut=False):
+        '''Returns the cached BSResult of these inputs, pricing them on a miss'''
+        key = make_key(spot_price, strike_price, risk_free_rate, exp_time,
+                       volatility, div_yield, dividends, is_fut)
+
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return self._results[key]
+
+            self.misses += 1
+
+        if isinstance(dividends, DividendSchedule):
+            divs = dividends
+        else:
+            # priced with the normalized dividends, so a key has one value
+            divs = [list(div) for div in key[6]] or None
+
+        result = BS(*key[:6], dividends=divs, is_fut=key[7]).result()
+
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+
+        return result
+
+    def invalidate(self, spot_price, strike_price, risk_free_rate, exp_time, volatility, div_yield=0.0, dividends=None, is_fut=False):
+        '''Drops the result of these inputs, returns True if it was cached'''
+        key = make_key(spot_price, strike_price, risk_free_rate, exp_time,
+                       volatility, div_yield, dividends, is_fut)
+
+        with self._lock:
+            return self._results.pop(key, None) is not None
+
+    def clear(self):
+        '''Drops every result and resets the counters'''
+        with self._lock:
+            self._results.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        '''Returns {'hits', 'misses', 'size', 'maxsize', 'hit_rate'}'''
+        with self._lock:
+            calls = self.hits + self.misses
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'size': len(self._results),
+                    'maxsize': self.maxsize,
+                    'hit_rate': self.hits / calls if calls else 0.0}
+
+    def __len__(self):
+        return len(self._results)
+
+
+def make_key(spot_price, strike_price, risk_free_rate, exp_time, volatility, div_yield=0.0, dividends=None, is_fut=False):
+    '''
+    Returns a hashable key of BS inputs; inputs BS ignores do not change it
+    (the dividend yield when there are dividends or for futures)
+    '''
+    if isinstance(dividends, DividendSchedule):
+        divs = ('schedule', dividends.convention, dividends.risk_free_rate,
+                tuple((float(a), float(d)) for a, d in dividends))
+    else:
+        divs = tuple(sorted((float(a), float(d)) for a, d in dividends or []))
+
+    if divs or is_fut:
+        div_yield = 0.0
+
+    return (float(spot_price), float(strike_price), float(risk_free_rate),
+            float(exp_time), float(volatility), float(div_yield), divs, bool(is_fut))
@@ -0,0 +1,135 @@
+'''
+Option chain window: every strike and expiry of one underlying in a table
+
+The whole chain is priced with one BatchBS call and kept as arrays;
+ChainModel formats a cell only when the QTableView asks for it, which it
+does for the visible rows only, so a chain of any length costs one row of
+widgets
+'''
+import numpy as np
+from PyQt5 import QtCore, QtWidgets
+
+from batch_bs import BatchBS
+
+# header, BatchBS output
+COLUMNS = [('Expiry, days', 'exp_time'),
+           ('Strike, K', 'strike_price'),
+           ('Call Price', 'call_price'),
+           ('Put Price', 'put_price'),
+           ('Call Delta', 'call_delta'),
+           ('Put Delta', 'put_delta'),
+           ('Gamma', 'gamma'),
+           ('Vega', 'vega'),
+           ('Call Theta', 'call_theta'),
+           ('Put Theta', 'put_theta'),
+           ('Call Rho', 'call_rho'),
+           ('Put Rho', 'put_rho')]
+
+
+class ChainModel(QtCore.QAbstractTableModel):
+    '''Table model over the arrays of a priced chain, one row per contract'''
+
+    def __init__(self, parent=None):
+        super(ChainModel, self).__init__(parent)
+        self.columns = {attr: np.empty(0) for _, attr in COLUMNS}
+
+    def setChain(self, columns):
+        '''Replaces the chain with {attr: 1-d array} of equal lengths'''
+        self.beginResetModel()
+        self.columns = columns
+        self.endResetModel()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns['strike_price'])
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        if role == QtCore.Qt.DisplayRole:
+            value = self.columns[COLUMNS[index.column()][1]][index.row()]
+            if index.column() == 0:
+                return str(int(value))
+            return str(round(float(value), 6))
+
+        if role == QtCore.Qt.TextAlignmentRole:
+            return int(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+
+        return None
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return COLUMNS[section][0]
+
+        return None
+
+
+class ChainWindow(QtWidgets.QWidget):
+    '''
+    Chain of the contract of the main window over a strike range and expiries
+    contract - generalised_bs.BS keyword arguments, the strike is replaced
+    '''
+
+    def __init__(self, contract, parent=None):
+        super(ChainWindow, self).__init__(parent, QtCore.Qt.Window)
+        self.setWindowTitle('Option Chain')
+        self.resize(1000, 600)
+        self.contract = dict(contract)
+
+        strike = self.contract.pop('strike_price')
+        self.strikeFrom = QtWidgets.QLineEdit(str(round(strike * 0.5, 2)))
+        self.strikeTo = QtWidgets.QLineEdit(str(round(strike * 1.5, 2)))
+        self.strikeStep = QtWidgets.QLineEdit(str(round(strike / 100, 2)))
+        self.expiries = QtWidgets.QLineEdit(str(self.contract.pop('exp_time')))
+        self.priceButton = QtWidgets.QPushButton('Price Chain')
+        self.infoText = QtWidgets.QLabel()
+
+        inputs = QtWidgets.QHBoxLayout()
+        for label, edit in [('Strikes from', self.strikeFrom), ('to', self.strikeTo),
+                            ('step', self.strikeStep), ('Expiries, days', self.expiries)]:
+            inputs.addWidget(QtWidgets.QLabel(label))
+            inputs.addWidget(edit)
+        inputs.addWidget(self.priceButton)
+
+        self.model = ChainModel(self)
+        self.table = QtWidgets.QTableView()
+        self.table.setModel(self.model)
+        # fixed row heights keep the view from measuring rows it does not show
+        self.table.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(22)
+        self.table.verticalHeader().hide()
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addLayout(inputs)
+        layout.addWidget(self.table)
+        layout.addWidget(self.infoText)
+
+        self.priceButton.clicked.connect(self.priceButtonClicked)
+        self.priceButtonClicked()
+
+    def priceButtonClicked(self):
+        try:
+            start = float(self.strikeFrom.text().replace(',', '.'))
+            stop = float(self.strikeTo.text().replace(',', '.'))
+            step = float(self.strikeStep.text().replace(',', '.'))
+            days = [float(day) for day in self.expiries.text().replace(';', ',').split(',')]
+            if step <= 0 or start <= 0 or stop < start:
+                raise ValueError
+        except ValueError:
+            self.infoText.setText('CHECK the strike range and the expiries (comma separated days)')
+            return
+
+        strikes = np.arange(start, stop + step / 2, step)
+        exp_time, strike_price = [x.ravel() for x in np.meshgrid(days, strikes, indexing='ij')]
+
+        bs = BatchBS(strike_price=strike_price, exp_time=exp_time, **self.contract)
+
+        columns = {'exp_time': exp_time, 'strike_price': strike_price}
+        for _, attr in COLUMNS[2:]:
+            columns[attr] = getattr(bs, attr)
+        self.model.setChain(columns)
+
+        self.infoText.setText(f'{len(strike_price)} contracts')
@@ -0,0 +1,199 @@
+'''
+Headless batch pricing of option contracts from CSV
+
+    python cli.py contracts.csv --dividends dividends.csv -o prices.csv
+
+Contracts CSV columns (same units as the GUI):
+    type      - Equity, Currency, Index or Future
+    S, K      - spot (or futures) price and strike price
+    r         - risk-free rate, %
+    q         - dividend yield or foreign risk-free rate, % (Currency, Index)
+    sigma     - volatility, %
+    start     - start date, dd.mm.yyyy
+    expiry    - expiration date, dd.mm.yyyy
+    dividends - reference into the dividends CSV, may be empty (Equity)
+
+Dividends CSV columns: ref, amount, date (dd.mm.yyyy)
+
+The input is read and priced in chunks of --chunk-size rows, so memory use
+does not depend on the file size. '-' (the default) reads stdin / writes stdout
+A row that cannot be priced (unknown type or dividends reference, a field
+that is not a number or a date, an expiry before the start) is written with
+empty results and the reason in the error column, and reported on stderr
+with its input line number; the other rows are priced as usual
+'''
+import argparse
+import csv
+import sys
+from functools import lru_cache
+from itertools import islice
+
+import numpy as np
+
+from dates import days_to_date
+from batch_bs import BatchBS
+from result import FIELDS
+
+UNDERLYING_TYPES = ['Equity', 'Currency', 'Index', 'Future']
+
+COLUMNS = ['type', 'S', 'K', 'r', 'q', 'sigma', 'start', 'expiry', 'dividends']
+
+# files repeat the same few dates, parsed once per pair
+_days_to_date = lru_cache(maxsize=4096)(days_to_date)
+
+
+def read_dividends(file):
+    '''
+    Returns {ref: [[amount, date], ...]} from a dividends CSV
+    Raises ValueError with the line number of a bad row
+    '''
+    dividends = {}
+    reader = csv.DictReader(file)
+    for row in reader:
+        try:
+            days_to_date(row['date'], row['date'])
+            dividends.setdefault(row['ref'], []).append(
+                [float(row['amount']), row['date']])
+        except (ValueError, TypeError, KeyError) as error:
+            raise ValueError(f'dividends line {reader.line_num}: {error}') from None
+
+    return dividends
+
+
+def price_chunk(rows, dividends):
+    '''
+    Prices a list of contract rows, returns one list of FIELDS values and
+    the error (empty if the row was priced) per row
+    '''
+    results = [[''] * len(FIELDS) + [''] for row in rows]
+
+    groups = {}
+    parsed = {}
+    for i, row in enumerate(rows):
+        try:
+            und_type, ref, start, contract = _parse(row, dividends)
+        except (ValueError, TypeError) as error:
+            results[i][-1] = str(error)
+            continue
+
+        # one BatchBS call per dividend stream
+        groups.setdefault((und_type, ref, start), []).append(i)
+        parsed[i] = contract
+
+    for (und_type, ref, start), idx in groups.items():
+        S, K, r, exp_time, sigma, q = np.array([parsed[i] for i in idx]).T
+
+        divs = None
+        if ref:
+            divs = [[amount, _days_to_date(start, date)]
+                    for amount, date in dividends[ref]]
+
+        bs = BatchBS(S, K, r, exp_time, sigma,
+                     div_yield=q if und_type in ['Currency', 'Index'] else 0.0,
+                     dividends=divs,
+                     is_fut=und_type == 'Future')
+
+        values = np.column_stack([getattr(bs, name) for name in FIELDS])
+        for i, row_values in zip(idx, values.tolist()):
+            results[i] = row_values + ['']
+
+    return results
+
+
+def price_stream(reader, dividends, chunk_size=10000, errors=None):
+    '''
+    Yields the input rows (as lists) with the results and the error added,
+    chunk by chunk; errors is called with (input line number, error) of
+    every row that could not be priced
+    '''
+    while True:
+        rows, lines = [], []
+        for row in islice(reader, chunk_size):
+            rows.append(row)
+            lines.append(reader.line_num)
+        if not rows:
+            return
+
+        for row, line, result in zip(rows, lines, price_chunk(rows, dividends)):
+            if result[-1] and errors is not None:
+                errors(line, result[-1])
+            yield list(row.values()) + result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Prices European options from a CSV file with the generalised Black Scholes model')
+    parser.add_argument('contracts', nargs='?', default='-',
+                        help="contracts CSV, '-' for stdin")
+    parser.add_argument('-d', '--dividends',
+                        help='dividends CSV (ref, amount, date)')
+    parser.add_argument('-o', '--output', default='-',
+                        help="output CSV, '-' for stdout")
+    parser.add_argument('-c', '--chunk-size', type=int, default=10000,
+                        help='rows priced per chunk')
+    args = parser.parse_args(argv)
+
+    dividends = {}
+    if args.dividends:
+        with open(args.dividends, newline='') as file:
+            try:
+                dividends = read_dividends(file)
+            except ValueError as error:
+                parser.error(str(error))
+
+    infile = sys.stdin if args.contracts == '-' else open(args.contracts, newline='')
+    outfile = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+
+    try:
+        reader = csv.DictReader(infile)
+        missing = [c for c in COLUMNS if c not in (reader.fieldnames or [])
+                   and c not in ['q', 'dividends']]
+        if missing:
+            parser.error(f"missing columns: {', '.join(missing)}")
+
+        def report(line, error):
+            print(f'line {line}: {error}', file=sys.stderr)
+
+        writer = csv.writer(outfile)
+        writer.writerow(list(reader.fieldnames) + list(FIELDS) + ['error'])
+        writer.writerows(price_stream(reader, dividends, args.chunk_size, report))
+
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+
+
+def _parse(row, dividends):
+    '''
+    Returns [underlying type, dividends reference, start date,
+    [S, K, r, exp_time, sigma, q]] of a row, raises ValueError if it cannot be priced
+    '''
+    und_type = (row['type'] or '').capitalize()
+    if und_type not in UNDERLYING_TYPES:
+        raise ValueError(f"Unknown underlying type: {row['type']}")
+
+    ref = (row.get('dividends') or '') if und_type == 'Equity' else ''
+    if ref and ref not in dividends:
+        raise ValueError(f'Unknown dividends reference: {ref}')
+
+    exp_time = _days_to_date(row['start'], row['expiry'])
+    if exp_time < 0:
+        raise ValueError(f"Expiry {row['expiry']} is before the start {row['start']}")
+
+    contract = [_number(row, name) for name in ['S', 'K', 'r']] + \
+        [exp_time, _number(row, 'sigma'), _number(row, 'q')]
+
+    return [und_type, ref, row['start'], contract]
+
+
+def _number(row, name):
+    try:
+        return float(row.get(name) or 0.0)
+    except ValueError:
+        raise ValueError(f'{name} is not a number: {row[name]}') from None
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,9 @@
+import datetime
+
+
+def days_to_date(date_str1, date_str2):
+    date1 = datetime.datetime.strptime(date_str1, "%d.%m.%Y")
+    date2 = datetime.datetime.strptime(date_str2, "%d.%m.%Y")
+    diff = date2 - date1
+
+    return int(diff.days)
@@ -0,0 +1,89 @@
+from bisect import bisect_right
+from math import exp
+
+CONVENTIONS = ['continuous', 'compound']
+
+
+class DividendSchedule:
+    '''
+    Discrete dividends of one underlying, discounted once at one rate
+    Can be passed as dividends to generalised_bs.BS, BatchBS and bs.BS
+    instead of the list of [amount, days] pairs
+
+    convention='continuous' discounts with exp(-r * t) (generalised_bs),
+    convention='compound' with (1 + r)**t (bs)
+
+    The present value of the dividends paid up to any expiry is a binary
+    search in the cumulative present values; total is the present value of
+    every dividend, paid or not, which bs.BS takes off the spot
+    '''
+
+    def __init__(self, dividends, risk_free_rate, convention='continuous'):
+        if convention not in CONVENTIONS:
+            raise ValueError(f'Unknown convention: {convention}, choose from {CONVENTIONS}')
+
+        self.risk_free_rate = risk_free_rate
+        self.convention = convention
+        self.dividends = sorted([list(div) for div in dividends], key=lambda div: div[1])
+
+        r = risk_free_rate / 100  # to decimals
+
+        # times in years, as the models compare them with T
+        self.times = []
+        self.cumulative_pv = [0.0]
+        for amount, days in self.dividends:
+            if convention == 'continuous':
+                pv = amount * exp(-r * days / 365)
+            else:
+                pv = amount / (1 + r)**(days / 365)
+
+            self.times.append(days / 365)
+            self.cumulative_pv.append(self.cumulative_pv[-1] + pv)
+
+        # dividends paid today or earlier are left out of pv()
+        self._first = bisect_right(self.times, 0.0)
+
+        self.total = self.cumulative_pv[-1]
+
+    def __len__(self):
+        return len(self.dividends)
+
+    def __iter__(self):
+        return iter(self.dividends)
+
+    def __repr__(self):
+        return (f'DividendSchedule({self.dividends!r}, {self.risk_free_rate!r}, '
+                f'convention={self.convention!r})')
+
+    def check(self, risk_free_rate, convention):
+        '''Raises ValueError if the schedule was built for another rate or convention'''
+        if convention != self.convention:
+            raise ValueError(f'DividendSchedule uses the {self.convention} convention, '
+                             f'the model needs {convention}')
+
+        if isinstance(risk_free_rate, (int, float)):
+            other_rate = risk_free_rate != self.risk_free_rate
+        else:
+            import numpy as np
+
+            other_rate = np.any(np.asarray(risk_free_rate) != self.risk_free_rate)
+
+        if other_rate:
+            raise ValueError(f'DividendSchedule was built for the rate {self.risk_free_rate}%')
+
+    def pv(self, exp_time):
+        '''Present value of the dividends paid in (0, exp_time] days'''
+        return self.pv_years(exp_time / 365)
+
+    def pv_years(self, T):
+        '''Present value of the dividends paid in (0, T] years, T may be an array'''
+        if isinstance(T, (int, float)):
+            idx = max(bisect_right(self.times, T), self._first)
+
+            return self.cumulative_pv[idx] - self.cumulative_pv[self._first]
+
+        import numpy as np
+
+        idx = np.maximum(np.searchsorted(self.times, T, side='right'), self._first)
+
+        return np.asarray(self.cumulative_pv)[idx] - self.cumulative_pv[self._first]
@@ -0,0 +1,324 @@
+'''
+Array pricing engine shared by BatchBS and the modules built on it
+
+Every underlying type is normalized once into the terms of one kernel,
+Black-76 on a discounted forward:
+    S      = D * F, the discounted forward (the adjusted spot)
+    pv_K   = D * K, D = exp(-r * T)
+    pv_div = d(S) / d(spot), the dividend discount factor
+    q      = the continuous yield the forward grows without
+so that
+    equity with discrete dividends - S = spot - dividends PV, q = 0
+    index                          - S = spot * exp(-q * T)
+    currency (Garman-Kohlhagen)    - as an index, q = the foreign rate
+    future (Black-76)              - S = F * exp(-r * T), q = r
+evaluate() prices all of them without per-contract branches: expired or
+zero volatility contracts are masked to their intrinsic values
+
+convention='bs' reproduces bs.BS: every dividend, whatever its date, is
+discounted with (1 + r)**t and taken off the spot, the result is discounted
+once more to expiry (S = D * (spot - dividends PV), q = r), and d1 keeps the
+unadjusted spot (log_moneyness = log(spot / pv_K))
+
+set_backend('numba') swaps evaluate() and the Newton iterations of
+implied_vol for the compiled kernels of numba_kernels, falling back to
+NumPy with a warning if Numba is missing
+
+precision='float32' stores the terms and outputs in single precision, half
+the memory of a large grid, while log(S / pv_K) and the cancelling sums of
+the prices and thetas are accumulated in double precision. FLOAT32_BOUNDS
+holds the error bound of each output against float64, checked by
+benchmark.py accuracy: |float32 - float64| / max(1, spot) for the outputs in
+money (MONEY_OUTPUTS), / max(1, |float64|) for the others
+The terms are narrowed at the shape of their own inputs and only then
+broadcast, and evaluate() works block by block, so the peak memory halves
+as well: FLOAT32_PEAK bounds it against float64, checked by benchmark.py memory
+'''
+import warnings
+
+import numpy as np
+import normdist as norm
+from dividends import DividendSchedule
+from result import FIELDS
+from scalar_engine import CONVENTIONS
+
+BACKENDS = ['numpy', 'numba']
+PRECISIONS = {'float64': np.float64, 'float32': np.float32}
+BLOCK_SIZE = 1 << 16  # contracts evaluate() computes at a time
+
+FLOAT32_BOUNDS = {'call_price': 1e-6, 'put_price': 1e-6,
+                  'call_delta': 5e-7, 'put_delta': 5e-7,
+                  'call_theta': 1e-7, 'put_theta': 1e-7,
+                  'call_rho': 1e-7, 'put_rho': 1e-7,
+                  'vega': 1e-7, 'gamma': 1e-6,
+                  'd1': 1e-6, 'd2': 1e-6}
+MONEY_OUTPUTS = ['call_price', 'put_price', 'call_theta', 'put_theta',
+                 'call_rho', 'put_rho', 'vega']
+FLOAT32_PEAK = 0.6  # peak memory of a float32 scenario grid / that of float64
+
+_numba_kernels = None
+
+
+def cash_dividends_pv(r, T, dividends=None, convention='continuous'):
+    '''
+    Present value of the cash dividends paid in (0, T] (r, T in decimals and years)
+    convention='compound' discounts them with (1 + r)**t, convention='bs' as
+    well, but counts every dividend whatever its date
+    Returns an array of the broadcast shape of r and T
+    '''
+    r, T = np.broadcast_arrays(np.asarray(r, dtype=float), np.asarray(T, dtype=float))
+
+    if isinstance(dividends, DividendSchedule):
+        return np.zeros(T.shape) + (dividends.total if convention == 'bs' else dividends.pv_years(T))
+
+    cash_div = np.zeros(T.shape)
+    for div in dividends or []:
+        paid = True if convention == 'bs' else (0 < div[1] / 365) & (div[1] / 365 <= T)
+        if convention in ['compound', 'bs']:
+            pv = div[0] / (1 + r)**(div[1] / 365)
+        else:
+            pv = div[0] * np.exp(-r * div[1] / 365)
+        cash_div += np.where(paid, pv, 0.0)
+
+    return cash_div
+
+
+def carry_terms(r, T, q, dividends=None, is_fut=False, convention='continuous'):
+    '''
+    Returns [cash dividends PV, dividend yield, dividend discount factor]
+    of generalised_bs.BS (r, T, q in decimals and years): discrete dividends
+    replace the yield, futures carry the rate as their yield
+    '''
+    r, T, q, is_fut = np.broadcast_arrays(r, T, q, is_fut)
+    cash_div = cash_dividends_pv(r, T, dividends, convention)
+
+    if isinstance(dividends, DividendSchedule) or dividends:
+        q = np.zeros(T.shape)
+
+    q = np.where(is_fut, r, q)
+
+    has_div = cash_div > 0
+    q = np.where(has_div, 0.0, q)
+    pv_div = np.where(has_div, 1.0, np.exp(-q * T))
+
+    return [cash_div, q, pv_div]
+
+
+def adjust_spot(S, r, T, q, dividends=None, is_fut=False, convention='continuous'):
+    '''
+    Array version of the spot adjustment in generalised_bs.BS.__init__ (r, T, q in decimals and years)
+    Returns [adjusted spot, dividend yield, dividend discount factor]
+    '''
+    S, r, T, q, is_fut = np.broadcast_arrays(S, r, T, q, is_fut)
+    cash_div, q, pv_div = carry_terms(r, T, q, dividends, is_fut, convention)
+
+    S = np.where(cash_div > 0, S - cash_div, S * pv_div)
+
+    return [S, q, pv_div]
+
+
+def forward_terms(spot_price, strike_price, risk_free_rate, exp_time, volatility, div_yield=0.0, dividends=None, is_fut=False, convention='continuous', precision='float64'):
+    '''
+    Returns the kernel terms of contracts given in the units of BS
+    {'S', 'K', 'r', 'T', 'sigma', 'q', 'pv_div', 'pv_K', 'sigma_root_T'},
+    read-only views of the broadcast shape in decimals and years, and for
+    float32 'log_moneyness', log(S / pv_K) computed before rounding the terms
+    '''
+    if convention not in CONVENTIONS:
+        raise ValueError(f'Unknown convention: {convention}, choose from {CONVENTIONS}')
+    if precision not in PRECISIONS:
+        raise ValueError(f'Unknown precision: {precision}, choose from {list(PRECISIONS)}')
+
+    S = np.asarray(spot_price, dtype=float)
+    K = np.asarray(strike_price, dtype=float)
+    r = np.asarray(risk_free_rate, dtype=float) / 100  # to decimals
+    T = np.asarray(exp_time, dtype=float) / 365  # to years
+    sigma = np.asarray(volatility, dtype=float) / 100  # to decimals
+    q = np.asarray(div_yield, dtype=float) / 100  # to decimals
+    is_fut = np.asarray(is_fut)
+
+    shape = np.broadcast_shapes(S.shape, K.shape, r.shape, T.shape, sigma.shape, q.shape, is_fut.shape)
+
+    if isinstance(dividends, DividendSchedule):
+        dividends.check(risk_free_rate, 'compound' if convention == 'bs' else convention)
+
+    # each term is computed at the shape of its own inputs, so that a grid
+    # of scenarios never holds more than one full-size array per output
+    spot = S
+    if convention == 'bs':
+        S, q, pv_div = _bs_spot(S, r, T, q, dividends, is_fut)
+    else:
+        S, q, pv_div = adjust_spot(S, r, T, q, dividends, is_fut, convention)
+
+    terms = {'S': S, 'K': K, 'r': r, 'T': T, 'sigma': sigma, 'q': q, 'pv_div': pv_div,
+             'pv_K': K * np.exp(-r * T), 'sigma_root_T': sigma * np.sqrt(T)}
+
+    if convention == 'bs' or precision == 'float32':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            terms['log_moneyness'] = np.log((spot if convention == 'bs' else S) / terms['pv_K'])
+
+    # narrowed before broadcasting: the full shape is only ever a view
+    dtype = PRECISIONS[precision]
+    terms = {name: np.broadcast_to(np.asarray(value).astype(dtype, copy=False), shape)
+             for name, value in terms.items()}
+
+    return terms
+
+
+def evaluate(S, K, r, T, sigma, q, pv_div, pv_K, sigma_root_T, log_moneyness=None):
+    '''
+    Returns d1, d2, the prices and Greeks (FIELDS) of forward_terms() as
+    {name: array} of the broadcast shape and the precision of S, with
+    'expired' (sigma == 0 or T == 0)
+    Contracts are evaluated BLOCK_SIZE at a time straight into the outputs,
+    so the temporaries of the kernel stay small whatever the chain size
+    '''
+    terms = [S, K, r, T, sigma, q, pv_div, pv_K, sigma_root_T, log_moneyness]
+    shape = np.broadcast_shapes(*[np.shape(x) for x in terms if x is not None])
+    dtype = np.result_type(S, np.float32)
+
+    kernel = _evaluate_block if _numba_kernels is None else _numba_kernels.evaluate_block
+    outputs = {name: np.empty(shape, dtype) for name in FIELDS}
+    for block in _blocks(shape):
+        kernel(*[None if x is None else np.broadcast_to(x, shape)[block] for x in terms],
+               outputs, block)
+
+    outputs['expired'] = np.broadcast_to((sigma == 0) | (T == 0), shape)
+
+    return outputs
+
+
+def _evaluate_block(S, K, r, T, sigma, q, pv_div, pv_K, sigma_root_T, log_moneyness, outputs, block):
+    '''NumPy kernel of evaluate(): writes the FIELDS of one block of terms into outputs[name][block]'''
+
+    # expired contracts get their intrinsic value, as in BS._price; they
+    # are evaluated on harmless stand-in terms and masked afterwards
+    expired = (sigma == 0) | (T == 0)
+    live_T = np.where(expired, 1.0, T)
+    live_root_T = np.where(expired, 1.0, sigma_root_T)
+
+    if log_moneyness is None:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_moneyness = np.log(S / pv_K)
+
+    d1, d2 = _d1_d2(log_moneyness, live_root_T, expired)
+
+    N_d1 = norm.array_cdf(d1)
+    N_d2 = norm.array_cdf(d2)
+    N_minus_d1 = norm.array_cdf(-d1)
+    N_minus_d2 = norm.array_cdf(-d2)
+    n_d1 = norm.array_pdf(d1)
+
+    # the cancelling sums in double precision, whatever the precision of S
+    wide_S = np.asarray(S, dtype=np.float64)
+    wide_pv_K = np.asarray(pv_K, dtype=np.float64)
+
+    call_price = np.where(expired, np.maximum(0.0, S - K), wide_S * N_d1 - wide_pv_K * N_d2)
+    put_price = np.where(expired, np.maximum(0.0, K - S), -wide_S * N_minus_d1 + wide_pv_K * N_minus_d2)
+
+    call_delta = np.where(expired, np.where(S > K, 1.0, 0.0), pv_div * N_d1)
+    put_delta = np.where(expired, np.where(S < K, -1.0, 0.0), pv_div * (N_d1 - 1))
+
+    first = -wide_S * n_d1 * live_root_T / (2 * np.asarray(live_T, dtype=np.float64))
+    call_theta = np.where(expired, 0.0, first + q * wide_S * N_d1 - r * wide_pv_K * N_d2)
+    put_theta = np.where(expired, 0.0, first - q * wide_S * N_minus_d1 + r * wide_pv_K * N_minus_d2)
+
+    call_rho = np.where(expired, 0.0, pv_K * T * N_d2)
+    put_rho = np.where(expired, 0.0, -pv_K * T * N_minus_d2)
+
+    vega = np.where(expired, 0.0, S * n_d1 * np.sqrt(T) / 100)
+    gamma = np.where(expired, 0.0, pv_div * n_d1 / (S * live_root_T / pv_div))
+
+    values = {'call_price': call_price, 'put_price': put_price,
+              'call_delta': call_delta, 'put_delta': put_delta,
+              'call_theta': call_theta / 365, 'put_theta': put_theta / 365,
+              'call_rho': call_rho / 100, 'put_rho': put_rho / 100,
+              'vega': vega, 'gamma': gamma, 'd1': d1, 'd2': d2}
+    for name, value in values.items():
+        outputs[name][block] = value
+
+
+def _d1_d2(log_moneyness, live_root_T, expired):
+    '''Returns [d1, d2] of one block, nan where the contract is expired'''
+    d1 = log_moneyness / live_root_T + 0.5 * live_root_T
+    d2 = d1 - live_root_T
+
+    return [np.where(expired, np.nan, d1), np.where(expired, np.nan, d2)]
+
+
+def _blocks(shape):
+    '''
+    Yields index tuples splitting an array of shape into blocks of at most
+    BLOCK_SIZE elements (or one row of the last axis, if it is longer):
+    the trailing axes that fit whole, ranges of the axis before them
+    '''
+    axis, inner = len(shape), 1
+    while axis > 0 and inner * shape[axis - 1] <= BLOCK_SIZE:
+        axis -= 1
+        inner *= shape[axis]
+
+    if axis == 0:
+        yield ()
+        return
+
+    step = max(1, BLOCK_SIZE // inner)
+    for outer in np.ndindex(*shape[:axis - 1]):
+        for start in range(0, shape[axis - 1], step):
+            yield outer + (slice(start, start + step),)
+
+
+def _bs_spot(S, r, T, q, dividends=None, is_fut=False):
+    '''
+    Spot adjustment of bs.BS, returns [adjusted spot, yield, dividend discount factor]
+    bs.BS falls back to the plain spot when the spot less the dividends is zero
+    '''
+    if np.any(q != 0) or np.any(is_fut):
+        raise ValueError('bs convention has no dividend yield or futures')
+
+    F = S - cash_dividends_pv(r, T, dividends, 'bs')
+    use_F = bool(dividends) & (F != 0)
+    D = np.exp(-r * T)
+
+    return [np.where(use_F, F * D, S), np.where(use_F, r, 0.0), np.where(use_F, D, 1.0)]
+
+
+def set_backend(name):
+    '''
+    Selects the kernel behind evaluate(), returns the backend in use:
+    'numpy' if 'numba' was asked for but Numba is not installed
+    '''
+    global _numba_kernels
+
+    if name == 'numpy':
+        _numba_kernels = None
+    elif name == 'numba':
+        try:
+            import numba_kernels
+        except ImportError:
+            warnings.warn('Numba is not installed, using the NumPy kernel')
+            _numba_kernels = None
+        else:
+            _numba_kernels = numba_kernels
+    else:
+        raise ValueError(f'Unknown backend: {name}, choose from {BACKENDS}')
+
+    return get_backend()
+
+
+def get_backend():
+    '''Returns the name of the current backend'''
+    return 'numpy' if _numba_kernels is None else 'numba'
+
+
+def black76(futures_price, strike_price, risk_free_rate, exp_time, volatility):
+    '''Options on futures: a BatchBS of the Black-76 model'''
+    from batch_bs import BatchBS
+
+    return BatchBS(futures_price, strike_price, risk_free_rate, exp_time, volatility, is_fut=True)
+
+
+def garman_kohlhagen(spot_rate, strike_price, domestic_rate, foreign_rate, exp_time, volatility):
+    '''Currency options: a BatchBS of the Garman-Kohlhagen model'''
+    from batch_bs import BatchBS
+
+    return BatchBS(spot_rate, strike_price, domestic_rate, exp_time, volatility, div_yield=foreign_rate)
@@ -0,0 +1,203 @@
+from math import sqrt, pi
+import numpy as np
+import engine
+import normdist as norm
+from batch_bs import adjust_spot
+from dividends import DividendSchedule
+
+
+# search interval for sigma, in decimals
+SIGMA_LOW = 1e-6
+SIGMA_HIGH = 10.0
+
+
+class ImpliedVol:
+    '''
+    Implied volatility of European options from market prices
+    Works on a single quote or on arrays of quotes (same units as BS)
+
+    model='generalised' uses generalised_bs.BS semantics (discrete dividends,
+    continuous yield, futures), model='bs' uses bs.BS semantics
+
+    Quotes that cannot be inverted are not raised on: their volatility is nan
+    and converged is False
+    The Newton iterations run compiled (numba_kernels) when
+    engine.set_backend('numba') is in use
+    '''
+
+    def __init__(self, price, spot_price, strike_price, risk_free_rate, exp_time, div_yield=0.0, dividends=None, is_fut=False, option='call', model='generalised', tol=1e-8, max_iter=50):
+
+        price = np.asarray(price, dtype=float)
+        S = np.asarray(spot_price, dtype=float)
+        K = np.asarray(strike_price, dtype=float)
+        r = np.asarray(risk_free_rate, dtype=float) / 100  # to decimals
+        T = np.asarray(exp_time, dtype=float) / 365  # to years
+        q = np.asarray(div_yield, dtype=float) / 100  # to decimals
+        is_call = np.asarray(option) == 'call'
+
+        scalar = all(np.ndim(x) == 0 for x in
+                     [price, S, K, r, T, q, is_fut, is_call])
+
+        price, S, K, r, T, q, is_fut, is_call = np.broadcast_arrays(
+            price, S, K, r, T, q, is_fut, is_call)
+
+        # every quote is reduced to  call = S_ref * N(d1) - X_ref * N(d2)
+        # with d1 = log(S_d1 / X_ref) / (sigma * sqrt(T)) + sigma * sqrt(T) / 2
+        if model == 'generalised':
+            if isinstance(dividends, DividendSchedule):
+                dividends.check(risk_free_rate, 'continuous')
+            S_ref = adjust_spot(S, r, T, q, dividends, is_fut)[0]
+            X_ref = K * np.exp(-r * T)
+            S_d1 = S_ref
+
+        elif model == 'bs':
+            if np.any(q != 0) or np.any(is_fut):
+                raise ValueError('bs model has no dividend yield or futures')
+
+            # bs.BS reduces the spot by every dividend, whatever the expiry
+            F = S
+            if isinstance(dividends, DividendSchedule):
+                dividends.check(risk_free_rate, 'compound')
+                F = F - dividends.total
+            elif dividends:
+                for div in dividends:
+                    F = F - div[0] / (1 + r)**(div[1] / 365)
+
+            D = np.exp(-r * T)
+            use_F = bool(dividends) & (F != 0)
+            S_ref = np.where(use_F, F * D, S)
+            X_ref = K * D
+            S_d1 = S
+
+        else:
+            raise ValueError(f'Unknown model: {model}')
+
+        # every quote is inverted on its out-of-the-money side,
+        # moved there through put-call parity if needed
+        otm_call = S_ref <= X_ref
+        parity = np.where(is_call, -1.0, 1.0) * (S_ref - X_ref)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            target = np.where(is_call == otm_call, price, price + parity)
+            log_m = np.log(S_d1 / X_ref)
+        root_T = np.sqrt(T)
+
+        # time value lost in rounding of a deep in-the-money quote
+        noise = np.where(is_call == otm_call, 0.0, 4 * np.finfo(float).eps *
+                         (np.abs(price) + np.abs(S_ref) + np.abs(X_ref)))
+
+        shape = target.shape
+        S_ref, X_ref, log_m, root_T, target, otm_call, noise = [
+            np.ravel(x) for x in np.broadcast_arrays(S_ref, X_ref, log_m, root_T, target, otm_call, noise)]
+
+        self.volatility = np.full(target.shape, np.nan)
+        self.converged = np.zeros(target.shape, dtype=bool)
+        self.iterations = np.zeros(target.shape, dtype=int)
+
+        # quotes outside the arbitrage bounds are left unconverged
+        valid = np.isfinite(target) & np.isfinite(log_m) & (root_T > 0) & \
+            (target > noise)
+        idx = np.flatnonzero(valid)
+        S_ref, X_ref, log_m = S_ref[idx], X_ref[idx], log_m[idx]
+        root_T, target, otm_call = root_T[idx], target[idx], otm_call[idx]
+
+        inside = (_price(SIGMA_LOW, S_ref, X_ref, log_m, root_T, otm_call)[0] <= target) & \
+            (target <= _price(SIGMA_HIGH, S_ref, X_ref, log_m, root_T, otm_call)[0])
+        idx, S_ref, X_ref = idx[inside], S_ref[inside], X_ref[inside]
+        log_m, root_T, target = log_m[inside], root_T[inside], target[inside]
+        otm_call = otm_call[inside]
+
+        sigma = _initial_guess(target, S_ref, X_ref, root_T, otm_call)
+
+        solve = _solve
+        if engine.get_backend() == 'numba':
+            import numba_kernels
+
+            solve = numba_kernels.implied_vol
+
+        volatility, converged, iterations = solve(sigma, S_ref, X_ref, log_m, root_T, target,
+                                                  otm_call, tol, max_iter, SIGMA_LOW, SIGMA_HIGH)
+        self.volatility[idx] = volatility
+        self.converged[idx] = converged
+        self.iterations[idx] = iterations
+
+        if scalar:
+            self.volatility = float(self.volatility[0])
+            self.converged = bool(self.converged[0])
+            self.iterations = int(self.iterations[0])
+        else:
+            self.volatility = self.volatility.reshape(shape)
+            self.converged = self.converged.reshape(shape)
+            self.iterations = self.iterations.reshape(shape)
+
+
+def _solve(sigma, S_ref, X_ref, log_m, root_T, target, is_call, tol, max_iter, low, high):
+    '''
+    Newton iterations from the initial sigma, kept in the bracket [low, high]
+    Returns [volatility (%, nan if not converged), converged, iterations]
+    '''
+    volatility = np.full(target.shape, np.nan)
+    converged = np.zeros(target.shape, dtype=bool)
+    iterations = np.full(target.shape, max_iter)
+
+    idx = np.arange(target.size)
+    low = np.full(idx.shape, low)
+    high = np.full(idx.shape, high)
+
+    for i in range(1, max_iter + 1):
+        price, vega = _price(sigma, S_ref, X_ref, log_m, root_T, is_call)
+        diff = price - target
+
+        # tol is on sigma (in decimals): the size of the next Newton step
+        # or the width of the bracket around the root
+        done = (np.abs(diff) <= tol * vega) | (high - low <= tol)
+        volatility[idx[done]] = sigma[done] * 100  # to percents
+        converged[idx[done]] = True
+        iterations[idx[done]] = i
+
+        keep = ~done
+        idx, sigma, diff, vega = idx[keep], sigma[keep], diff[keep], vega[keep]
+        price = price[keep]
+        S_ref, X_ref, log_m = S_ref[keep], X_ref[keep], log_m[keep]
+        root_T, target = root_T[keep], target[keep]
+        is_call, low, high = is_call[keep], low[keep], high[keep]
+        if not idx.size:
+            break
+
+        # Newton step on log(price), which stays well conditioned far
+        # out of the money, replaced by bisection when it leaves the bracket
+        high = np.where(diff > 0, sigma, high)
+        low = np.where(diff < 0, sigma, low)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            step = sigma - np.log(price / target) * price / vega
+        bad = ~np.isfinite(step) | (step <= low) | (step >= high)
+        sigma = np.where(bad, 0.5 * (low + high), step)
+
+    return [volatility, converged, iterations]
+
+
+def _price(sigma, S_ref, X_ref, log_m, root_T, is_call):
+    '''Returns [option price, d(option price) / d(sigma)] of the reduced quote'''
+    sigma_root_T = sigma * root_T
+    d1 = log_m / sigma_root_T + 0.5 * sigma_root_T
+    d2 = d1 - sigma_root_T
+
+    n_d1 = norm.array_pdf(d1)
+    n_d2 = norm.array_pdf(d2)
+
+    price = np.where(is_call, S_ref * norm.array_cdf(d1) - X_ref * norm.array_cdf(d2),
+                     X_ref * norm.array_cdf(-d2) - S_ref * norm.array_cdf(-d1))
+    # equals the BS vega S * n(d1) * sqrt(T) whenever S_d1 == S_ref
+    dd = log_m / (sigma * sigma_root_T)
+    vega = S_ref * n_d1 * (0.5 * root_T - dd) + X_ref * n_d2 * (0.5 * root_T + dd)
+
+    return [price, vega]
+
+
+def _initial_guess(price, S_ref, X_ref, root_T, is_call):
+    '''Corrado-Miller approximation of sigma, clipped to the search interval'''
+    call = np.where(is_call, price, price + S_ref - X_ref)
+    half_gap = call - (S_ref - X_ref) / 2
+    disc = np.maximum(half_gap**2 - (S_ref - X_ref)**2 / pi, 0.0)
+    sigma = sqrt(2 * pi) / (S_ref + X_ref) * (half_gap + np.sqrt(disc)) / root_T
+
+    return np.clip(np.nan_to_num(sigma, nan=0.2), 10 * SIGMA_LOW, SIGMA_HIGH / 2)
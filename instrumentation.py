@@ -0,0 +1,162 @@
+'''
+Opt-in timers and counters for the pricing core
+
+    import instrumentation
+    instrumentation.enable()
+    ...  # price as usual
+    instrumentation.snapshot()    # or instrumentation.prometheus()
+    instrumentation.disable()
+
+enable() replaces the STAGES methods with timed wrappers and the COUNTED
+normal distribution functions with timed and counting ones (their stage is
+normdist.<function>), disable() puts the originals back, so a disabled run
+executes exactly the uninstrumented code.
+Stage times are inclusive: BS.__init__ contains the stages it calls.
+BatchBS and the engine d1/d2 stage are instrumented if batch_bs is imported
+before enable() (the numba backend computes d1/d2 inside its compiled
+kernel, so that stage only appears on the NumPy backend), and
+normdist.set_backend() should be called before enable() as well
+'''
+import sys
+from functools import wraps
+from importlib import import_module
+from threading import Lock
+from time import perf_counter
+
+# module, class (None for module functions), timed methods
+STAGES = [('bs', 'BS', ['__init__']),
+          ('generalised_bs', 'BS', ['__init__']),
+          ('scalar_engine', None, ['forward_terms', 'cash_dividends_pv']),
+          ('scalar_engine', 'ScalarKernel', ['_d1_d2', '_price', '_delta', '_theta',
+                                             '_rho', '_vega', '_gamma']),
+          ('engine', None, ['_d1_d2']),
+          ('batch_bs', 'BatchBS', ['__init__', '_evaluate'])]
+
+# NumPy modules, instrumented only if they are already imported
+NUMPY_MODULES = ['engine', 'batch_bs']
+
+# normdist functions timed, and counted per evaluated point
+COUNTED = ['cdf', 'pdf', 'array_cdf', 'array_pdf']
+
+# stages taking a dividend list, counted per dividend: {stage: argument index}
+DIVIDEND_STAGES = {'cash_dividends_pv': 2}
+
+PREFIX = 'bsm'
+
+_lock = Lock()
+_stages = {}
+_counters = {}
+_originals = {}
+
+
+def enable():
+    '''Starts timing the pricing stages and counting evaluations'''
+    if _originals:
+        return
+
+    for module_name, class_name, methods in STAGES:
+        if module_name in NUMPY_MODULES and module_name not in sys.modules:
+            continue  # keeps NumPy out of a scalar-only process
+
+        owner = import_module(module_name)
+        if class_name is not None:
+            owner = getattr(owner, class_name)
+        for method in methods:
+            stage = '.'.join(name for name in [module_name, class_name, method] if name)
+            _patch(owner, method, _timed(getattr(owner, method), stage,
+                                         DIVIDEND_STAGES.get(method)))
+
+    norm = import_module('normdist')
+    for function in COUNTED:
+        name = f'normdist.{function}'
+        _patch(norm, function, _counted(_timed(getattr(norm, function), name), name))
+
+
+def disable():
+    '''Restores the uninstrumented functions, keeps the collected values'''
+    for (owner, name), [original, wrapper] in _originals.items():
+        # normdist.set_backend may have rebound the function meanwhile
+        if owner.__dict__.get(name) is wrapper:
+            setattr(owner, name, original)
+
+    _originals.clear()
+
+
+def is_enabled():
+    return bool(_originals)
+
+
+def reset():
+    '''Zeroes every timer and counter'''
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+
+def snapshot():
+    '''
+    Returns {'enabled': bool,
+             'stages': {stage: {'calls': int, 'seconds': float}},
+             'counters': {name: int}}
+    '''
+    with _lock:
+        return {'enabled': is_enabled(),
+                'stages': {stage: {'calls': calls, 'seconds': seconds}
+                           for stage, [calls, seconds] in sorted(_stages.items())},
+                'counters': dict(sorted(_counters.items()))}
+
+
+def prometheus():
+    '''Returns the snapshot in the Prometheus text exposition format'''
+    values = snapshot()
+    lines = [f'# HELP {PREFIX}_stage_calls_total Calls of each pricing stage',
+             f'# TYPE {PREFIX}_stage_calls_total counter']
+    lines += [f'{PREFIX}_stage_calls_total{{stage="{stage}"}} {value["calls"]}'
+              for stage, value in values['stages'].items()]
+
+    lines += [f'# HELP {PREFIX}_stage_seconds_total Time spent in each pricing stage',
+              f'# TYPE {PREFIX}_stage_seconds_total counter']
+    lines += [f'{PREFIX}_stage_seconds_total{{stage="{stage}"}} {value["seconds"]!r}'
+              for stage, value in values['stages'].items()]
+
+    lines += [f'# HELP {PREFIX}_evaluations_total Normal distribution points and dividends evaluated',
+              f'# TYPE {PREFIX}_evaluations_total counter']
+    lines += [f'{PREFIX}_evaluations_total{{name="{name}"}} {count}'
+              for name, count in values['counters'].items()]
+
+    return '\n'.join(lines) + '\n'
+
+
+def _patch(owner, name, wrapper):
+    _originals[(owner, name)] = [owner.__dict__[name], wrapper]
+    setattr(owner, name, wrapper)
+
+
+def _timed(func, stage, dividends=None):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = perf_counter() - start
+            with _lock:
+                timer = _stages.setdefault(stage, [0, 0.0])
+                timer[0] += 1
+                timer[1] += elapsed
+                if dividends is not None and len(args) > dividends:
+                    _counters['dividends'] = (_counters.get('dividends', 0) +
+                                              len(args[dividends] or []))
+
+    return wrapper
+
+
+def _counted(func, name):
+    @wraps(func)
+    def wrapper(x):
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + getattr(x, 'size', 1)
+
+        return func(x)
+
+    return wrapper
@@ -0,0 +1,167 @@
+'''
+Monte Carlo pricing of path-dependent options on the underlyings of
+generalised_bs.BS (equity with discrete dividends, index or currency with a
+yield, futures), under the same escrowed-dividend lognormal model
+
+Paths are simulated in chunks of chunk_size, one monitoring step at a time,
+keeping only the running spot, average, extremes and barrier hits of each
+path: memory is O(chunk_size) whatever the number of paths and steps.
+Each chunk draws from its own child of SeedSequence(seed), chunks may run in
+worker processes, and their statistics are merged in chunk order, so a seed
+gives the same price for any number of workers
+'''
+import os
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil, exp, sqrt
+
+import numpy as np
+
+from dividends import DividendSchedule
+from engine import carry_terms, cash_dividends_pv
+from generalised_bs import BS
+
+PAYOFFS = ['european', 'asian', 'barrier', 'lookback']
+BARRIERS = ['up-and-out', 'up-and-in', 'down-and-out', 'down-and-in']
+
+
+class MonteCarlo:
+    '''
+    Monte Carlo price of one option, inputs in the same units as BS
+        payoff      - 'european', 'asian' (arithmetic average of the monitored
+                      spots, fixed strike), 'barrier' (discretely monitored,
+                      barrier and barrier_type needed) or 'lookback' (floating
+                      strike: S_T - min for a call, max - S_T for a put)
+        option      - 'call' or 'put'
+        steps       - monitoring dates, one per day of exp_time by default
+        antithetic  - pairs every path with its mirror image (paths and
+                      chunk_size are rounded up to even numbers)
+        control_variate - corrects the estimate with the European option of
+                      the same strike, whose price BS knows exactly
+    Stores price, std_error, paths and beta (the control variate coefficient)
+    '''
+
+    def __init__(self, spot_price, strike_price, risk_free_rate, exp_time, volatility, div_yield=0.0, dividends=None, is_fut=False, payoff='asian', option='call', barrier=None, barrier_type='up-and-out', steps=None, paths=100000, chunk_size=10000, antithetic=True, control_variate=True, seed=None, workers=None):
+
+        if payoff not in PAYOFFS:
+            raise ValueError(f'Unknown payoff: {payoff}, choose from {PAYOFFS}')
+        if payoff == 'barrier' and (barrier is None or barrier_type not in BARRIERS):
+            raise ValueError(f'A barrier option needs a barrier and a barrier_type from {BARRIERS}')
+        if option not in ['call', 'put']:
+            raise ValueError(f'Unknown option: {option}')
+
+        r = risk_free_rate / 100  # to decimals
+        T = exp_time / 365  # to years
+        sigma = volatility / 100  # to decimals
+        steps = steps or max(1, ceil(exp_time))
+        dt = T / steps
+
+        if isinstance(dividends, DividendSchedule):
+            dividends.check(risk_free_rate, 'continuous')
+
+        cash_div, q = [float(x) for x in carry_terms(r, T, div_yield / 100, dividends, is_fut)[:2]]
+
+        # PV at each monitoring date of the dividends still to be paid
+        times = dt * np.arange(1, steps + 1)
+        escrow = np.exp(r * times) * (cash_div - cash_dividends_pv(r, times, dividends))
+
+        model = {'S': spot_price, 'escrowed_S': spot_price - cash_div, 'K': strike_price,
+                 'drift': (r - q - sigma**2 / 2) * dt, 'vol': sigma * sqrt(dt),
+                 'discount': exp(-r * T), 'escrow': escrow, 'payoff': payoff,
+                 'is_call': option == 'call', 'barrier': barrier,
+                 'barrier_type': barrier_type, 'antithetic': antithetic}
+
+        if antithetic:
+            # whole pairs only, so paths counts what is simulated
+            paths += paths % 2
+            chunk_size += chunk_size % 2
+
+        sizes = [min(chunk_size, paths - start) for start in range(0, paths, chunk_size)]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        workers = workers or os.cpu_count()
+
+        if workers == 1 or len(sizes) <= 1:
+            chunks = [_simulate_chunk(model, size, child) for size, child in zip(sizes, seeds)]
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(sizes))) as pool:
+                chunks = list(pool.map(_simulate_chunk, [model] * len(sizes), sizes, seeds))
+
+        stats = chunks[0]
+        for chunk in chunks[1:]:
+            stats = _merge(stats, chunk)
+        n, mean_y, mean_x, m_yy, m_xx, m_xy = stats
+
+        var_y = m_yy / max(n - 1, 1)
+        self.beta = 0.0
+        self.price = mean_y
+        if control_variate and m_xx > 0:
+            european = BS(spot_price, strike_price, risk_free_rate, exp_time, volatility,
+                          div_yield, dividends, is_fut)
+            exact = european.call_price if option == 'call' else european.put_price
+
+            self.beta = m_xy / m_xx
+            self.price = mean_y - self.beta * (mean_x - exact)
+            var_y = max(m_yy - m_xy**2 / m_xx, 0.0) / max(n - 2, 1)
+
+        self.paths = sum(sizes)
+        self.std_error = sqrt(var_y / n)
+
+
+def _simulate_chunk(model, size, seed):
+    '''
+    Returns the statistics of one chunk of paths:
+    [samples, mean payoff, mean European payoff, and their centred second moments]
+    An antithetic pair counts as one sample, the mean of its two payoffs
+    '''
+    m = model
+    rng = np.random.Generator(np.random.PCG64(seed))
+    half = size // 2 if m['antithetic'] else size
+
+    log_S = np.full((2 if m['antithetic'] else 1, half), np.log(m['escrowed_S']))
+    total = np.zeros(log_S.shape)
+    low = np.full(log_S.shape, float(m['S']))
+    high = np.full(log_S.shape, float(m['S']))
+
+    for escrow in m['escrow']:
+        z = rng.standard_normal(half)
+        log_S += m['drift'] + m['vol'] * (np.stack([z, -z]) if m['antithetic'] else z)
+        spot = np.exp(log_S) + escrow
+
+        total += spot
+        np.minimum(low, spot, out=low)
+        np.maximum(high, spot, out=high)
+
+    sign = 1.0 if m['is_call'] else -1.0
+    european = np.maximum(sign * (spot - m['K']), 0.0)
+
+    if m['payoff'] == 'european':
+        payoff = european
+    elif m['payoff'] == 'asian':
+        payoff = np.maximum(sign * (total / len(m['escrow']) - m['K']), 0.0)
+    elif m['payoff'] == 'lookback':
+        payoff = spot - low if m['is_call'] else high - spot
+    else:
+        hit = high >= m['barrier'] if m['barrier_type'].startswith('up') else low <= m['barrier']
+        payoff = np.where(hit == m['barrier_type'].endswith('in'), european, 0.0)
+
+    y = m['discount'] * payoff.mean(axis=0)
+    x = m['discount'] * european.mean(axis=0)
+
+    mean_y, mean_x = y.mean(), x.mean()
+    dy, dx = y - mean_y, x - mean_x
+
+    return [len(y), mean_y, mean_x, dy @ dy, dx @ dx, dx @ dy]
+
+
+def _merge(a, b):
+    '''Combines the statistics of two chunks (Chan et al. pairwise update)'''
+    n_a, y_a, x_a, yy_a, xx_a, xy_a = a
+    n_b, y_b, x_b, yy_b, xx_b, xy_b = b
+
+    n = n_a + n_b
+    dy, dx = y_b - y_a, x_b - x_a
+    weight = n_a * n_b / n
+
+    return [n, y_a + dy * n_b / n, x_a + dx * n_b / n,
+            yy_a + yy_b + dy * dy * weight,
+            xx_a + xx_b + dx * dx * weight,
+            xy_a + xy_b + dx * dy * weight]
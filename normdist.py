@@ -0,0 +1,142 @@
+'''
+Standard normal distribution backends for the pricing models
+
+'math'  - math.erfc on Python floats, no dependencies (default)
+'numpy' - scipy.special.ndtr, works on NumPy arrays as well as floats
+'scipy' - scipy.stats.norm, the generic scipy distribution machinery
+
+cdf and pdf of all backends agree to within TOLERANCE (absolute) on any
+float, and to within RELATIVE_TOLERANCE (relative) wherever the result
+is not subnormal; backend_differences() measures both
+'''
+import sys
+from math import erfc, exp, sqrt, pi
+
+TOLERANCE = 1e-15
+RELATIVE_TOLERANCE = 1e-12
+
+BACKENDS = ['math', 'numpy', 'scipy']
+
+SCIPY_MESSAGE = ('Program requires scipy to work properly\n'
+                 'How to install: https://www.scipy.org/install.html\n'
+                 'pip install scipy')
+
+_ROOT_2 = sqrt(2)
+_ROOT_2_PI = sqrt(2 * pi)
+
+_backend = 'math'
+_ndtr = None
+
+
+def math_cdf(x):
+    '''Normal CDF of a float'''
+    return 0.5 * erfc(-x / _ROOT_2)
+
+
+def math_pdf(x):
+    '''Normal PDF of a float'''
+    return exp(-0.5 * x * x) / _ROOT_2_PI
+
+
+def array_cdf(x):
+    '''Normal CDF of a NumPy array (or a float)'''
+    return (_ndtr or _load_ndtr())(x)
+
+
+def array_pdf(x):
+    '''Normal PDF of a NumPy array (or a float)'''
+    import numpy as np
+
+    return np.exp(-0.5 * np.square(x)) / _ROOT_2_PI
+
+
+def scipy_cdf(x):
+    '''Normal CDF through scipy.stats.norm'''
+    return _scipy_norm().cdf(x)
+
+
+def scipy_pdf(x):
+    '''Normal PDF through scipy.stats.norm'''
+    return _scipy_norm().pdf(x)
+
+
+# the functions used by bs.BS and generalised_bs.BS, see set_backend
+cdf = math_cdf
+pdf = math_pdf
+
+
+def set_backend(name):
+    '''Selects the backend behind normdist.cdf and normdist.pdf'''
+    global cdf, pdf, _backend
+
+    if name == 'math':
+        cdf, pdf = math_cdf, math_pdf
+    elif name == 'numpy':
+        _load_ndtr()
+        cdf, pdf = array_cdf, array_pdf
+    elif name == 'scipy':
+        _scipy_norm()
+        cdf, pdf = scipy_cdf, scipy_pdf
+    else:
+        raise ValueError(f'Unknown backend: {name}, choose from {BACKENDS}')
+
+    _backend = name
+
+
+def get_backend():
+    '''Returns the name of the current backend'''
+    return _backend
+
+
+def backend_differences(points):
+    '''
+    Returns {backend: [largest absolute, largest relative difference]} of
+    cdf and pdf from the 'math' backend over the points, for every other
+    backend that is installed; relative differences skip subnormal results
+    '''
+    reference = [[math_cdf(x), math_pdf(x)] for x in points]
+
+    differences = {}
+    for backend in BACKENDS[1:]:
+        previous = _backend
+        try:
+            set_backend(backend)
+            other = [[float(cdf(x)), float(pdf(x))] for x in points]
+        except ImportError:
+            continue
+        finally:
+            set_backend(previous)
+
+        absolute = relative = 0.0
+        for values, others in zip(reference, other):
+            for value, value_other in zip(values, others):
+                diff = abs(value_other - value)
+                absolute = max(absolute, diff)
+                if abs(value) >= sys.float_info.min:
+                    relative = max(relative, diff / abs(value))
+
+        differences[backend] = [absolute, relative]
+
+    return differences
+
+
+def _load_ndtr():
+    global _ndtr
+
+    try:
+        from scipy.special import ndtr
+    except ImportError:
+        raise ImportError(SCIPY_MESSAGE) from None
+
+    _ndtr = ndtr
+
+    return ndtr
+
+
+def _scipy_norm():
+    try:
+        from scipy.stats import norm
+    except ImportError:
+        raise ImportError(SCIPY_MESSAGE) from None
+
+    return norm
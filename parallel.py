@@ -0,0 +1,98 @@
+'''
+Multi-core batch pricing with the generalised Black Scholes model
+
+Inputs and outputs live in multiprocessing.shared_memory blocks: workers
+attach to them by name, price their chunk with BatchBS and write the results
+in place, so no array is pickled between processes
+'''
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from batch_bs import BatchBS
+from result import FIELDS
+
+INPUTS = ['spot_price', 'strike_price', 'risk_free_rate', 'exp_time',
+          'volatility', 'div_yield', 'is_fut']
+
+
+class ParallelBS:
+    '''
+    Prices a chain like BatchBS, split across a pool of worker processes
+    Stores every output of BatchBS (FIELDS) as an array of the broadcast shape
+    '''
+
+    def __init__(self, spot_price, strike_price, risk_free_rate, exp_time, volatility, div_yield=0.0, dividends=None, is_fut=False, workers=None, chunk_size=100000):
+
+        arrays = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in
+                                       [spot_price, strike_price, risk_free_rate, exp_time,
+                                        volatility, div_yield, is_fut]])
+        shape = arrays[0].shape
+        size = arrays[0].size
+        workers = workers or os.cpu_count()
+
+        inputs = _SharedArray(len(INPUTS), size)
+        outputs = _SharedArray(len(FIELDS), size)
+        try:
+            for row, array in zip(inputs.array, arrays):
+                row[:] = array.ravel()
+
+            chunks = [(start, min(start + chunk_size, size))
+                      for start in range(0, size, chunk_size)]
+
+            if workers == 1 or len(chunks) <= 1:
+                for start, stop in chunks:
+                    _price_chunk(inputs.name, outputs.name, size, start, stop, dividends)
+            else:
+                with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+                    jobs = [pool.submit(_price_chunk, inputs.name, outputs.name, size,
+                                        start, stop, dividends)
+                            for start, stop in chunks]
+                    for job in jobs:
+                        job.result()
+
+            for name, row in zip(FIELDS, outputs.array):
+                self.__dict__[name] = row.reshape(shape).copy()
+
+        finally:
+            inputs.release()
+            outputs.release()
+
+
+class _SharedArray:
+    '''(rows, size) float array in a new shared memory block'''
+
+    def __init__(self, rows, size):
+        self.block = shared_memory.SharedMemory(create=True, size=max(rows * size * 8, 1))
+        self.name = self.block.name
+        self.array = np.ndarray((rows, size), dtype=float, buffer=self.block.buf)
+
+    def release(self):
+        '''Frees the block, the array must not be used afterwards'''
+        del self.array
+        self.block.close()
+        self.block.unlink()
+
+
+def _price_chunk(inputs_name, outputs_name, size, start, stop, dividends):
+    '''Prices columns start:stop of the shared inputs into the shared outputs'''
+    inputs_block = shared_memory.SharedMemory(name=inputs_name)
+    outputs_block = shared_memory.SharedMemory(name=outputs_name)
+    try:
+        inputs = np.ndarray((len(INPUTS), size), dtype=float, buffer=inputs_block.buf)
+        S, K, r, T, sigma, q, is_fut = inputs[:, start:stop].copy()
+        del inputs
+
+        bs = BatchBS(S, K, r, T, sigma, div_yield=q, dividends=dividends,
+                     is_fut=is_fut != 0)
+
+        outputs = np.ndarray((len(FIELDS), size), dtype=float, buffer=outputs_block.buf)
+        for i, name in enumerate(FIELDS):
+            outputs[i, start:stop] = getattr(bs, name)
+        del outputs
+
+    finally:
+        inputs_block.close()
+        outputs_block.close()
@@ -0,0 +1,134 @@
+'''
+Tick-driven incremental repricing of a book of contracts
+
+Each contract keeps its terms grouped by what they depend on:
+    rate      - pv_K, cash dividend PV, dividend yield factor
+    volatility - sigma * sqrt(T)
+    spot      - adjusted spot, d1, d2, price and Greeks
+A tick recomputes only its own stage and the stages after it, and only
+for the contracts it affects
+'''
+import numpy as np
+
+from batch_bs import BatchBS
+from dividends import DividendSchedule
+from engine import carry_terms
+from result import FIELDS, BSResult
+
+
+class RepricingEngine:
+    '''
+    Book of contracts priced with the generalised Black Scholes model
+        underlying    - underlying id of each contract
+        strike_price, exp_time, volatility, div_yield, is_fut - per contract,
+                        same units as generalised_bs.BS
+        spot_price    - {underlying: spot}
+        risk_free_rate - one rate for the book, %
+        dividends     - {underlying: list of [amount, days] or DividendSchedule}
+        on_update     - called with the indices of repriced contracts
+
+    Prices and Greeks are kept as arrays (FIELDS), one value per contract
+    '''
+
+    def __init__(self, underlying, strike_price, exp_time, volatility, spot_price, risk_free_rate, div_yield=0.0, dividends=None, is_fut=False, on_update=None):
+
+        self.underlying = np.asarray(underlying)
+        n = len(self.underlying)
+
+        self.K = np.broadcast_to(np.asarray(strike_price, dtype=float), n).copy()
+        self.T = np.broadcast_to(np.asarray(exp_time, dtype=float), n) / 365  # to years
+        self.sigma = np.broadcast_to(np.asarray(volatility, dtype=float), n) / 100  # to decimals
+        self.div_yield = np.broadcast_to(np.asarray(div_yield, dtype=float), n) / 100  # to decimals
+        self.is_fut = np.broadcast_to(np.asarray(is_fut, dtype=bool), n).copy()
+
+        self.spot = dict(spot_price)
+        self.spot_price = np.array([self.spot[u] for u in self.underlying], dtype=float)
+        self.dividends = dict(dividends or {})
+        self.on_update = on_update
+
+        self.contracts = {u: np.flatnonzero(self.underlying == u)
+                          for u in np.unique(self.underlying)}
+
+        self.S = np.empty(n)
+        self.r = np.empty(n)
+        self.q = np.empty(n)
+        self.pv_K = np.empty(n)
+        self.pv_div = np.empty(n)
+        self.cash_div = np.empty(n)
+        self.sigma_root_T = np.empty(n)
+        for name in FIELDS:
+            self.__dict__[name] = np.empty(n)
+
+        self.tick_rate(risk_free_rate)
+
+    def tick_spot(self, underlying, spot_price):
+        '''New spot of one underlying: reprices only its contracts'''
+        self.spot[underlying] = spot_price
+        idx = self.contracts.get(underlying, np.empty(0, dtype=int))
+        self.spot_price[idx] = spot_price
+        self._spot_stage(idx)
+
+        return self._publish(idx)
+
+    def tick_vol(self, idx, volatility):
+        '''New volatility (%) of the contracts at idx'''
+        idx = np.atleast_1d(np.asarray(idx))
+        self.sigma[idx] = np.asarray(volatility, dtype=float) / 100  # to decimals
+        self._vol_stage(idx)
+        self._spot_stage(idx)
+
+        return self._publish(idx)
+
+    def tick_rate(self, risk_free_rate):
+        '''New risk-free rate (%) of the book: reprices every contract'''
+        self.risk_free_rate = risk_free_rate
+        idx = np.arange(len(self.underlying))
+        self._rate_stage()
+        self._vol_stage(idx)
+        self._spot_stage(idx)
+
+        return self._publish(idx)
+
+    def result(self, i):
+        '''Returns the BSResult of contract i'''
+        return BSResult(*[getattr(self, name)[i].item() for name in FIELDS])
+
+    def _rate_stage(self):
+        r = self.risk_free_rate / 100  # to decimals
+        self.r[:] = r
+        self.pv_K[:] = self.K * np.exp(-r * self.T)
+
+        for u, contracts in self.contracts.items():
+            if isinstance(self.dividends.get(u), DividendSchedule):
+                self.dividends[u].check(self.risk_free_rate, 'continuous')
+
+            cash_div, q, pv_div = carry_terms(
+                r, self.T[contracts], self.div_yield[contracts],
+                self.dividends.get(u), self.is_fut[contracts])
+            self.cash_div[contracts] = cash_div
+            self.q[contracts] = q
+            self.pv_div[contracts] = pv_div
+
+    def _vol_stage(self, idx):
+        self.sigma_root_T[idx] = self.sigma[idx] * np.sqrt(self.T[idx])
+
+    def _spot_stage(self, idx):
+        if not len(idx):
+            return
+
+        spot = self.spot_price[idx]
+        has_div = self.cash_div[idx] > 0
+        self.S[idx] = np.where(has_div, spot - self.cash_div[idx], spot * self.pv_div[idx])
+
+        bs = BatchBS.from_terms(self.S[idx], self.K[idx], self.r[idx], self.T[idx],
+                                self.sigma[idx], self.q[idx], self.pv_div[idx],
+                                self.pv_K[idx], self.sigma_root_T[idx])
+
+        for name in FIELDS:
+            self.__dict__[name][idx] = getattr(bs, name)
+
+    def _publish(self, idx):
+        if self.on_update is not None and len(idx):
+            self.on_update(idx)
+
+        return idx
@@ -0,0 +1,48 @@
+# fields of a priced contract, in the order BSResult takes them
+FIELDS = ('call_price', 'put_price', 'call_delta', 'put_delta',
+          'call_theta', 'put_theta', 'call_rho', 'put_rho',
+          'vega', 'gamma', 'd1', 'd2')
+
+
+class BSResult:
+    '''
+    Immutable result of one priced contract
+    Has the same field names as BS but no per-instance __dict__,
+    so millions of them can be held in memory
+    '''
+    __slots__ = FIELDS
+
+    def __init__(self, *values):
+        if len(values) != len(FIELDS):
+            raise TypeError(f'BSResult takes {len(FIELDS)} values, got {len(values)}')
+
+        for name, value in zip(FIELDS, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('BSResult is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('BSResult is immutable')
+
+    def __iter__(self):
+        return (getattr(self, name) for name in FIELDS)
+
+    def __eq__(self, other):
+        if not isinstance(other, BSResult):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __reduce__(self):
+        return (BSResult, tuple(self))
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={value!r}' for name, value in zip(FIELDS, self))
+        return f'BSResult({fields})'
+
+    def as_dict(self):
+        '''Returns the fields as {name: value}'''
+        return dict(zip(FIELDS, self))
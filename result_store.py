@@ -0,0 +1,162 @@
+'''
+Column-per-field result store for risk runs larger than memory
+
+    directory/
+        manifest.json      - shape, dtype, fields, chunking and completed chunks
+        <field>.npy        - one array of the broadcast shape per output
+        inputs/<input>.npy - the contract inputs (INPUTS), before broadcasting
+
+write_results() prices contracts chunk by chunk with BatchBS straight into
+the .npy files, opened as memory maps, and records every chunk in the
+manifest once its columns are flushed: a run that was interrupted resumes
+from the chunks it had not completed. Workers are passed only the path of
+the store and read the inputs of their chunk from the memory-mapped inputs/.
+StoredResults opens the columns with np.load(mmap_mode='r'), zero-copy,
+any .npy reader can do the same
+'''
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch_bs import BatchBS
+from engine import PRECISIONS
+from result import FIELDS
+
+MANIFEST = 'manifest.json'
+VERSION = 1
+
+INPUTS = ['spot_price', 'strike_price', 'risk_free_rate', 'exp_time',
+          'volatility', 'div_yield', 'is_fut']
+
+
+def write_results(path, spot_price, strike_price, risk_free_rate, exp_time, volatility, div_yield=0.0, dividends=None, is_fut=False, fields=FIELDS, precision='float64', chunk_size=1000000, workers=1):
+    '''
+    Prices contracts (same arguments as BatchBS) into the store at path,
+    fields - BatchBS outputs to store, workers - processes pricing chunks
+    Resumes the run of a store with the same inputs, raises ValueError if
+    path holds the results of other inputs. Returns a StoredResults
+    '''
+    if precision not in PRECISIONS:
+        raise ValueError(f'Unknown precision: {precision}, choose from {list(PRECISIONS)}')
+
+    inputs = [np.asarray(x, dtype=float) for x in
+              [spot_price, strike_price, risk_free_rate, exp_time, volatility, div_yield, is_fut]]
+    shape = np.broadcast_shapes(*[x.shape for x in inputs])
+    size = int(np.prod(shape))
+
+    manifest = {'version': VERSION, 'shape': list(shape), 'dtype': precision,
+                'fields': list(fields), 'chunk_size': chunk_size,
+                'chunks': -(-size // chunk_size),
+                'inputs': _fingerprint(inputs, dividends), 'completed': []}
+
+    os.makedirs(path, exist_ok=True)
+    stored = _read_manifest(path)
+    if stored is None:
+        os.makedirs(os.path.join(path, 'inputs'), exist_ok=True)
+        for name, x in zip(INPUTS, inputs):
+            np.save(os.path.join(path, 'inputs', name + '.npy'), x)
+        for name in fields:
+            np.lib.format.open_memmap(os.path.join(path, name + '.npy'), mode='w+',
+                                      dtype=PRECISIONS[precision], shape=shape).flush()
+        _write_manifest(path, manifest)
+    else:
+        if {key: value for key, value in stored.items() if key != 'completed'} != \
+                {key: value for key, value in manifest.items() if key != 'completed'}:
+            raise ValueError(f'{path} holds the results of other inputs or settings')
+        manifest = stored
+
+    done = set(manifest['completed'])
+    chunks = [(i, i * chunk_size, min((i + 1) * chunk_size, size))
+              for i in range(manifest['chunks']) if i not in done]
+    job = (path, shape, dividends, list(fields), precision)
+
+    if workers == 1 or len(chunks) <= 1:
+        for i, start, stop in chunks:
+            _price_chunk(job, start, stop)
+            _complete(path, manifest, i)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            jobs = {i: pool.submit(_price_chunk, job, start, stop) for i, start, stop in chunks}
+            for i, future in jobs.items():
+                future.result()
+                _complete(path, manifest, i)
+
+    return StoredResults(path)
+
+
+class StoredResults:
+    '''
+    Results of write_results() at path, every field a read-only memory map
+    of the stored shape; complete is False while chunks are missing
+    (their values are zeros)
+    '''
+
+    def __init__(self, path):
+        manifest = _read_manifest(path)
+        if manifest is None:
+            raise FileNotFoundError(f'No {MANIFEST} in {path}')
+
+        self.path = path
+        self.shape = tuple(manifest['shape'])
+        self.fields = manifest['fields']
+        self.completed = sorted(manifest['completed'])
+        self.complete = len(self.completed) == manifest['chunks']
+
+        for name in self.fields:
+            self.__dict__[name] = np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+
+
+def _price_chunk(job, start, stop):
+    '''Prices flat positions start:stop of the inputs into the .npy columns'''
+    path, shape, dividends, fields, precision = job
+    inputs = [np.load(os.path.join(path, 'inputs', name + '.npy'), mmap_mode='r')
+              for name in INPUTS]
+
+    # flat slices of the broadcast views, only the chunk is copied
+    S, K, r, T, sigma, q, is_fut = [np.broadcast_to(x, shape).flat[start:stop] for x in inputs]
+    bs = BatchBS(S, K, r, T, sigma, div_yield=q, dividends=dividends,
+                 is_fut=is_fut != 0, precision=precision)
+
+    for name in fields:
+        column = np.load(os.path.join(path, name + '.npy'), mmap_mode='r+')
+        column.reshape(-1)[start:stop] = getattr(bs, name)
+        column.flush()
+        del column
+
+
+def _complete(path, manifest, chunk):
+    '''Records a flushed chunk in the manifest'''
+    manifest['completed'] = sorted(set(manifest['completed']) | {chunk})
+    _write_manifest(path, manifest)
+
+
+def _read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(path, manifest):
+    '''Replaces the manifest atomically, an interruption keeps the old one'''
+    temp = os.path.join(path, MANIFEST + '.tmp')
+    with open(temp, 'w') as file:
+        json.dump(manifest, file, indent=1)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp, os.path.join(path, MANIFEST))
+
+
+def _fingerprint(inputs, dividends):
+    '''Hash of the contract inputs, before broadcasting'''
+    digest = hashlib.sha1()
+    for x in inputs:
+        digest.update(str(x.shape).encode())
+        digest.update(np.ascontiguousarray(x).tobytes())
+    digest.update(repr(dividends).encode())
+
+    return digest.hexdigest()
@@ -0,0 +1,308 @@
+'''
+Scalar version of engine for one contract, standard library only so that
+the pricing core imports without NumPy; bs.BS and generalised_bs.BS are
+both built on it
+
+forward_terms() normalizes a contract into the terms of engine.forward_terms()
+(adjusted spot S, pv_K, pv_div, q, sigma_root_T, log_moneyness), and
+ScalarKernel evaluates d1, d2, the prices and Greeks of engine.evaluate()
+from them. Expired or zero volatility contracts (expired: T == 0 or
+sigma == 0) are evaluated on stand-in terms (T = 1, sigma = 1) and masked
+to their intrinsic values, as engine.evaluate() does; a zero strike or
+spot gives the IEEE results of the NumPy kernel instead of raising
+'''
+from math import copysign, exp, inf, log, nan, sqrt
+
+import normdist as norm
+from dividends import DividendSchedule
+from result import FIELDS, BSResult
+
+CONVENTIONS = ['continuous', 'compound', 'bs']
+
+# outputs of each kernel method, for the lazy mode
+OUTPUTS = {'_price': ['call_price', 'put_price'],
+           '_delta': ['call_delta', 'put_delta'],
+           '_theta': ['call_theta', 'put_theta'],
+           '_rho': ['call_rho', 'put_rho'],
+           '_vega': ['vega'],
+           '_gamma': ['gamma'],
+           '_vanna': ['vanna'],
+           '_volga': ['volga'],
+           '_charm': ['call_charm', 'put_charm'],
+           '_speed': ['speed'],
+           '_zomma': ['zomma'],
+           '_color': ['color']}
+
+
+def cash_dividends_pv(r, T, dividends=None, convention='continuous'):
+    '''Scalar engine.cash_dividends_pv: PV of the cash dividends paid in (0, T] (decimals and years)'''
+    if isinstance(dividends, DividendSchedule):
+        return dividends.total if convention == 'bs' else dividends.pv_years(T)
+
+    pv = 0.0
+    for div in dividends or []:
+        if convention == 'bs' or 0 < div[1] / 365 <= T:
+            if convention == 'continuous':
+                pv += div[0] * exp(-r * div[1] / 365)
+            else:
+                pv += div[0] / (1 + r)**(div[1] / 365)
+
+    return pv
+
+
+def carry_terms(r, T, q, dividends=None, is_fut=False, convention='continuous'):
+    '''Scalar engine.carry_terms: [cash dividends PV, dividend yield, dividend discount factor]'''
+    cash_div = cash_dividends_pv(r, T, dividends, convention)
+
+    if isinstance(dividends, DividendSchedule) or dividends:
+        q = 0.0
+    if is_fut:
+        q = r
+    if cash_div > 0:
+        return [cash_div, 0.0, 1.0]
+
+    return [cash_div, q, exp(-q * T)]
+
+
+def forward_terms(spot_price, strike_price, risk_free_rate, exp_time, volatility, div_yield=0.0, dividends=None, is_fut=False, convention='continuous'):
+    '''
+    Returns the kernel terms of one contract given in the units of BS
+    {'S', 'K', 'r', 'T', 'sigma', 'q', 'pv_div', 'pv_K', 'sigma_root_T',
+    'log_moneyness', 'expired'}, as engine.forward_terms() does for arrays
+    '''
+    if convention not in CONVENTIONS:
+        raise ValueError(f'Unknown convention: {convention}, choose from {CONVENTIONS}')
+
+    S = spot_price
+    K = strike_price
+    r = risk_free_rate / 100  # to decimals
+    T = exp_time / 365  # to years
+    sigma = volatility / 100  # to decimals
+    q = div_yield / 100  # to decimals
+
+    if isinstance(dividends, DividendSchedule):
+        dividends.check(risk_free_rate, 'compound' if convention == 'bs' else convention)
+
+    spot = S
+    if convention == 'bs':
+        # every dividend off the spot, discounted once more to expiry
+        if q != 0 or is_fut:
+            raise ValueError('bs convention has no dividend yield or futures')
+
+        F = S - cash_dividends_pv(r, T, dividends, 'bs')
+        pv_div = 1.0
+        if dividends and F != 0:
+            pv_div = exp(-r * T)
+            S, q = F * pv_div, r
+    else:
+        cash_div, q, pv_div = carry_terms(r, T, q, dividends, is_fut, convention)
+        S = S - cash_div if cash_div > 0 else S * pv_div
+
+    pv_K = K * exp(-r * T)
+
+    return {'S': S, 'K': K, 'r': r, 'T': T, 'sigma': sigma, 'q': q, 'pv_div': pv_div,
+            'pv_K': pv_K, 'sigma_root_T': sigma * sqrt(T),
+            'log_moneyness': _log_ratio(spot if convention == 'bs' else S, pv_K),
+            'expired': sigma == 0 or T == 0}
+
+
+class ScalarKernel:
+    '''
+    Prices and Greeks of one contract from the terms of forward_terms()
+    Subclasses call _evaluate(terms, lazy) from __init__; with lazy=True each
+    output is computed when it is first accessed, the higher-order Greeks
+    (vanna, volga, call_charm, put_charm, speed, zomma, color) always are
+    '''
+
+    def _evaluate(self, terms, lazy=False):
+        '''Sets the terms, d1 and d2, and unless lazy the prices and Greeks'''
+        if not lazy:
+            for name in FIELDS[:-2]:
+                self.__dict__[name] = None
+
+        self.__dict__.update(terms)
+
+        [self.d1, self.d2] = self._d1_d2()
+
+        if lazy:
+            return
+
+        [self.call_price, self.put_price] = self._price()
+
+        [self.call_delta, self.put_delta] = self._delta()
+        [self.call_theta, self.put_theta] = self._theta()
+        [self.call_rho, self.put_rho] = self._rho()
+        self.vega = self._vega()
+        self.gamma = self._gamma()
+
+    def __getattr__(self, name):
+        '''
+        Computes N(d1), N(d2), N(-d1), N(-d2) and n(d1) once, on first use,
+        and every output not computed yet when it is first accessed
+        '''
+        if name == '_N_d1':
+            value = norm.cdf(self.d1)
+        elif name == '_N_d2':
+            value = norm.cdf(self.d2)
+        elif name == '_N_minus_d1':
+            value = norm.cdf(-self.d1)
+        elif name == '_N_minus_d2':
+            value = norm.cdf(-self.d2)
+        elif name == '_n_d1':
+            value = norm.pdf(self.d1)
+        else:
+            for method, names in OUTPUTS.items():
+                if name in names:
+                    values = getattr(self, method)()
+                    if len(names) == 1:
+                        values = [values]
+                    self.__dict__.update(zip(names, values))
+
+                    return self.__dict__[name]
+
+            raise AttributeError(name)
+
+        self.__dict__[name] = value
+
+        return value
+
+    def result(self):
+        '''Returns the price, Greeks, d1 and d2 as a compact immutable BSResult'''
+        return BSResult(*[getattr(self, name) for name in FIELDS])
+
+    def _live(self):
+        '''Returns [T, sigma, sigma * sqrt(T)] of the contract, stand-ins of 1 if it is expired'''
+        if self.expired:
+            return [1.0, 1.0, 1.0]
+
+        return [self.T, self.sigma, self.sigma_root_T]
+
+    def _d1_d2(self):
+        '''Returns [d1, d2], nan if the contract is expired'''
+        root_T = self._live()[2]
+        d1 = self.log_moneyness / root_T + 0.5 * root_T
+        d2 = d1 - root_T
+
+        return [nan, nan] if self.expired else [d1, d2]
+
+    def _price(self):
+        '''Returns the option price: [Call price, Put price]'''
+        call = self.S * self._N_d1 - self.pv_K * self._N_d2
+        put = -self.S * self._N_minus_d1 + self.pv_K * self._N_minus_d2
+
+        if self.expired:
+            return [float(max(0.0, self.S - self.K)), float(max(0.0, self.K - self.S))]
+
+        return [call, put]
+
+    def _delta(self):
+        '''Returns the option delta: [Call delta, Put delta]'''
+        call = self.pv_div * self._N_d1
+        put = self.pv_div * (self._N_d1 - 1)
+
+        if self.expired:
+            return [1.0 if self.S > self.K else 0.0, -1.0 if self.S < self.K else 0.0]
+
+        return [call, put]
+
+    def _theta(self):
+        '''Returns the option theta: [Call theta, Put theta]'''
+        T, sigma, root_T = self._live()
+        first = -self.S * self._n_d1 * root_T / (2 * T)
+
+        call = first + self.q * self.S * self._N_d1 - self.r * self.pv_K * self._N_d2
+        put = first - self.q * self.S * self._N_minus_d1 + self.r * self.pv_K * self._N_minus_d2
+
+        return [0.0, 0.0] if self.expired else [call / 365, put / 365]
+
+    def _rho(self):
+        '''Returns the option rho: [Call rho, Put rho]'''
+        call = self.pv_K * self.T * self._N_d2
+        put = -self.pv_K * self.T * self._N_minus_d2
+
+        return [0.0, 0.0] if self.expired else [call / 100, put / 100]
+
+    def _vega(self):
+        '''Returns the option vega'''
+        vega = self.S * self._n_d1 * sqrt(self.T) / 100
+
+        return 0.0 if self.expired else vega
+
+    def _gamma(self):
+        '''Returns the option gamma'''
+        root_T = self._live()[2]
+        gamma = _ratio(self.pv_div * self._n_d1, self.S * root_T / self.pv_div)
+
+        return 0.0 if self.expired else gamma
+
+    # higher-order Greeks: per 1% of volatility and per day, like vega and theta
+
+    def _vanna(self):
+        '''Returns the option vanna: d(delta) / d(volatility)'''
+        sigma = self._live()[1]
+        vanna = -self.pv_div * self._n_d1 * self.d2 / sigma / 100
+
+        return 0.0 if self.expired else vanna
+
+    def _volga(self):
+        '''Returns the option volga (vomma): d(vega) / d(volatility)'''
+        sigma = self._live()[1]
+        volga = self.S * self._n_d1 * sqrt(self.T) * self.d1 * self.d2 / sigma / 100**2
+
+        return 0.0 if self.expired else volga
+
+    def _charm(self):
+        '''Returns the option charm, delta decay: [Call charm, Put charm]'''
+        T, sigma, root_T = self._live()
+        decay = self.pv_div * self._n_d1 * (2 * (self.r - self.q) * T - self.d2 *
+                                            root_T) / (2 * T * root_T)
+
+        call = self.q * self.pv_div * self._N_d1 - decay
+        put = -self.q * self.pv_div * self._N_minus_d1 - decay
+
+        return [0.0, 0.0] if self.expired else [call / 365, put / 365]
+
+    def _speed(self):
+        '''Returns the option speed: d(gamma) / d(spot price)'''
+        root_T = self._live()[2]
+        speed = -_ratio(self._gamma() * self.pv_div, self.S) * (self.d1 / root_T + 1)
+
+        return 0.0 if self.expired else speed
+
+    def _zomma(self):
+        '''Returns the option zomma: d(gamma) / d(volatility)'''
+        sigma = self._live()[1]
+        zomma = self._gamma() * (self.d1 * self.d2 - 1) / sigma / 100
+
+        return 0.0 if self.expired else zomma
+
+    def _color(self):
+        '''Returns the option color, gamma decay'''
+        T, sigma, root_T = self._live()
+        color = self._gamma() / (2 * T) * (
+            2 * self.q * T + 1 + self.d1 * (2 * (self.r - self.q) * T -
+                                            self.d2 * root_T) / root_T)
+
+        return 0.0 if self.expired else color / 365
+
+
+def _ratio(a, b):
+    '''a / b with the IEEE results of NumPy: +-inf or nan for b == 0'''
+    if b != 0:
+        return a / b
+    if a == 0 or a != a:
+        return nan
+
+    return inf if (a > 0) == (copysign(1.0, b) > 0) else -inf
+
+
+def _log_ratio(a, b):
+    '''log(a / b) with the IEEE results of np.log(a / b): inf, -inf or nan instead of raising'''
+    if a > 0 and b > 0:
+        return log(a / b)
+
+    x = _ratio(a, b)
+    if x > 0:
+        return log(x) if x != inf else inf
+
+    return -inf if x == 0 else nan
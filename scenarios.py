@@ -0,0 +1,93 @@
+'''
+Scenario grids: price and Greeks over spot shocks x vol shocks x days forward
+The whole Cartesian product is priced with one broadcast BatchBS call
+'''
+import numpy as np
+
+from batch_bs import BatchBS
+from dividends import DividendSchedule
+from result import FIELDS
+
+DIMS = ('spot', 'vol', 'days')
+
+
+class ScenarioGrid:
+    '''
+    Revalues contracts (same arguments as BatchBS) on a grid of scenarios
+        spot_shocks  - relative spot moves, % (-10 = spot down 10%)
+        vol_shocks   - additive volatility moves, vol points (%)
+        days_forward - days rolled forward (expiry and dividends move closer)
+        convention   - discounting of the dividends, as in BatchBS; a
+                       DividendSchedule must match it and the rate
+
+    Every field of FIELDS is stored with shape contracts + (spot, vol, days),
+    where contracts is the broadcast shape of the contract inputs
+    (empty for a single contract); coords holds the labels of the grid axes
+    precision='float32' stores the fields in single precision (engine.FLOAT32_BOUNDS),
+    book() still sums them in double precision
+    '''
+
+    def __init__(self, spot_price, strike_price, risk_free_rate, exp_time, volatility, div_yield=0.0, dividends=None, is_fut=False, spot_shocks=(0,), vol_shocks=(0,), days_forward=(0,), convention='continuous', precision='float64'):
+
+        contracts = [np.asarray(x, dtype=float) for x in
+                     [spot_price, strike_price, risk_free_rate, exp_time,
+                      volatility, div_yield, is_fut]]
+        shape = np.broadcast_shapes(*[x.shape for x in contracts])
+
+        self.dims = tuple(f'contract_{i}' for i in range(len(shape))) + DIMS
+        self.coords = {'spot': np.asarray(spot_shocks, dtype=float),
+                       'vol': np.asarray(vol_shocks, dtype=float),
+                       'days': np.asarray(days_forward, dtype=float)}
+
+        # contracts on the leading axes, scenarios on the last three
+        S, K, r, T, sigma, q, fut = [x.reshape(x.shape + (1, 1, 1)) for x in contracts]
+        spot = self.coords['spot'].reshape(-1, 1, 1)
+        vol = self.coords['vol'].reshape(-1, 1)
+        days = self.coords['days']
+
+        if isinstance(dividends, DividendSchedule):
+            # convention='bs' discounts as 'compound', as in engine.forward_terms
+            dividends.check(risk_free_rate, 'compound' if convention == 'bs' else convention)
+
+        # the schedule is shifted by the days forward, so it is discounted
+        # again from each scenario date as a list
+        if dividends:
+            dividends = [[div[0], div[1] - days] for div in dividends]
+
+        bs = BatchBS(S * (1 + spot / 100),
+                     K,
+                     r,
+                     np.maximum(T - days, 0.0),
+                     np.maximum(sigma + vol, 0.0),
+                     div_yield=q,
+                     dividends=dividends,
+                     is_fut=fut != 0,
+                     convention=convention,
+                     precision=precision)
+
+        for name in FIELDS:
+            self.__dict__[name] = getattr(bs, name)
+
+    def book(self, quantity=1.0, is_call=True):
+        '''
+        Returns {'price', 'delta', 'theta', 'rho', 'vega', 'gamma'} of a book:
+        the sum over contracts of quantity times the call (or put) field,
+        each a (spot, vol, days) array
+        '''
+        n = len(self.dims) - len(DIMS)
+        quantity = np.asarray(quantity, dtype=float)
+        quantity = quantity.reshape(quantity.shape + (1, 1, 1))
+        is_call = np.asarray(is_call)
+        is_call = is_call.reshape(is_call.shape + (1, 1, 1))
+
+        result = {}
+        for name in ['price', 'delta', 'theta', 'rho', 'vega', 'gamma']:
+            if name in ['vega', 'gamma']:
+                field = getattr(self, name)
+            else:
+                field = np.where(is_call, getattr(self, 'call_' + name),
+                                 getattr(self, 'put_' + name))
+
+            result[name] = np.sum(quantity * field, axis=tuple(range(n)))
+
+        return result
@@ -0,0 +1,195 @@
+'''
+Asyncio pricing service with request micro-batching
+
+    python server.py --port 8765 --window 2 --max-batch 10000
+
+Line-delimited JSON over TCP, one request per line:
+    {"id": 1, "contract": {"spot_price": 100, "strike_price": 105,
+                           "risk_free_rate": 2.5, "exp_time": 90,
+                           "volatility": 26.07}}
+    {"id": 2, "contracts": [{...}, {...}]}
+Contract keys are the arguments of generalised_bs.BS (div_yield, dividends
+and is_fut are optional). Each response line is
+    {"id": 1, "result": {"call_price": ..., ...}}   (or "results": [...])
+    {"id": 1, "error": "..."}
+
+Requests arriving within --window milliseconds of each other are priced
+together with one BatchBS call per dividend stream, up to --max-batch
+contracts. At most --max-pending requests wait for pricing: beyond that
+clients are not read from until the queue drains
+'''
+import argparse
+import asyncio
+import json
+
+import numpy as np
+
+from batch_bs import BatchBS
+from result import FIELDS
+
+REQUIRED = ['spot_price', 'strike_price', 'risk_free_rate', 'exp_time', 'volatility']
+
+
+class MicroBatcher:
+    '''Coalesces concurrent pricing requests into vectorized BatchBS calls'''
+
+    def __init__(self, window=0.002, max_batch=10000, max_pending=1000):
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.batches = 0
+        self.contracts = 0
+
+    async def price(self, contracts):
+        '''Returns one {field: value} dict per contract dict'''
+        contracts = [_parse(contract) for contract in contracts]
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((contracts, future))
+
+        return await future
+
+    async def run(self):
+        '''Prices the queued requests batch by batch, forever'''
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.window
+
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            self._price_batch(batch)
+
+    def _price_batch(self, batch):
+        contracts = [contract for request, _ in batch for contract in request]
+        results = [None] * len(contracts)
+
+        groups = {}
+        for i, contract in enumerate(contracts):
+            groups.setdefault(contract['dividends'], []).append(i)
+
+        try:
+            for dividends, idx in groups.items():
+                columns = {key: np.array([contracts[i][key] for i in idx])
+                           for key in REQUIRED + ['div_yield', 'is_fut']}
+                bs = BatchBS(columns['spot_price'],
+                             columns['strike_price'],
+                             columns['risk_free_rate'],
+                             columns['exp_time'],
+                             columns['volatility'],
+                             div_yield=columns['div_yield'],
+                             dividends=[list(div) for div in dividends] or None,
+                             is_fut=columns['is_fut'])
+
+                values = np.column_stack([getattr(bs, name) for name in FIELDS]).tolist()
+                for i, row in zip(idx, values):
+                    results[i] = {name: None if value != value else value
+                                  for name, value in zip(FIELDS, row)}
+
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        self.batches += 1
+        self.contracts += len(contracts)
+
+        start = 0
+        for request, future in batch:
+            if not future.done():
+                future.set_result(results[start:start + len(request)])
+            start += len(request)
+
+
+async def handle(reader, writer, batcher):
+    '''Serves one client connection, one request line at a time'''
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+
+            response = {}
+            try:
+                request = json.loads(line)
+                response['id'] = request.get('id')
+
+                if 'contract' in request:
+                    response['result'] = (await batcher.price([request['contract']]))[0]
+                else:
+                    response['results'] = await batcher.price(request['contracts'])
+
+            except Exception as error:
+                response['error'] = f'{type(error).__name__}: {error}'
+
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+
+    except ConnectionError:
+        pass
+
+    finally:
+        writer.close()
+
+
+async def serve(host='127.0.0.1', port=8765, window=0.002, max_batch=10000, max_pending=1000):
+    batcher = MicroBatcher(window, max_batch, max_pending)
+    worker = asyncio.create_task(batcher.run())
+
+    server = await asyncio.start_server(
+        lambda reader, writer: handle(reader, writer, batcher), host, port)
+
+    print(f'Pricing service on {host}:{port}')
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        worker.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Micro-batching pricing service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--window', type=float, default=2.0,
+                        help='batching window, ms')
+    parser.add_argument('--max-batch', type=int, default=10000,
+                        help='contracts priced per batch at most')
+    parser.add_argument('--max-pending', type=int, default=1000,
+                        help='requests waiting for pricing at most')
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.window / 1000,
+                          args.max_batch, args.max_pending))
+    except KeyboardInterrupt:
+        pass
+
+
+def _parse(contract):
+    '''Returns a normalized contract dict, raises on missing or invalid inputs'''
+    missing = [key for key in REQUIRED if key not in contract]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+
+    parsed = {key: float(contract[key]) for key in REQUIRED}
+    parsed['div_yield'] = float(contract.get('div_yield') or 0.0)
+    parsed['is_fut'] = bool(contract.get('is_fut', False))
+    parsed['dividends'] = tuple((float(amount), float(days))
+                                for amount, days in contract.get('dividends') or [])
+
+    return parsed
+
+
+if __name__ == '__main__':
+    main()
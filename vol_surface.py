@@ -0,0 +1,151 @@
+'''
+Implied volatility surface from option quotes
+
+Every expiry is fitted with a raw SVI slice of the total implied variance
+    w(k) = a + b * (rho * (k - m) + sqrt((k - m)**2 + s**2))
+against the log-moneyness k = log(K / F), F the forward of generalised_bs.BS.
+For fixed (m, s) the slice is linear in a, b * rho and b, so the fit is a
+least-squares solve over a grid of (m, s), refined around the best
+point (quasi-explicit SVI calibration): no iterative optimizer.
+Between expiries the total variance is interpolated linearly in time at
+fixed k, after making it non-decreasing across expiries, so the surface
+has no calendar arbitrage
+'''
+import numpy as np
+
+from batch_bs import adjust_spot
+from dividends import DividendSchedule
+from implied_vol import ImpliedVol
+
+# (m, s) grid of each fitting pass, every pass refines the previous one
+GRID_SIZE = 15
+PASSES = 4
+MIN_QUOTES = 5  # per expiry, fewer are fitted with a flat slice
+
+
+class VolSurface:
+    '''
+    Volatility surface of one underlying, fitted to market prices
+    Takes arrays of quotes in the same units as ImpliedVol (option is
+    'call' or 'put' per quote); quotes whose implied volatility does not
+    converge are left out
+
+    Stores expiries (days) and the SVI parameters of each: a, b, rho, m, s
+    volatility(strike_price, exp_time) returns volatilities in % for BS
+    '''
+
+    def __init__(self, price, spot_price, strike_price, risk_free_rate, exp_time, div_yield=0.0, dividends=None, is_fut=False, option='call'):
+
+        if isinstance(dividends, DividendSchedule):
+            dividends.check(risk_free_rate, 'continuous')
+
+        self.spot_price = spot_price
+        self.risk_free_rate = risk_free_rate
+        self.div_yield = div_yield
+        self.dividends = dividends
+        self.is_fut = is_fut
+
+        iv = ImpliedVol(price, spot_price, strike_price, risk_free_rate, exp_time,
+                        div_yield, dividends, is_fut, option)
+
+        K, days, vol, ok = [np.ravel(x) for x in np.broadcast_arrays(
+            strike_price, exp_time, iv.volatility, iv.converged)]
+        K, days, vol = K[ok], days[ok].astype(float), vol[ok]
+
+        self.expiries = np.unique(days[days > 0])
+        params = []
+        for expiry in self.expiries:
+            quotes = days == expiry
+            T = expiry / 365  # to years
+            k = self._log_moneyness(K[quotes], expiry)
+            params.append(_fit_svi(k, (vol[quotes] / 100)**2 * T, T))
+
+        self.a, self.b, self.rho, self.m, self.s = np.array(params).reshape(-1, 5).T
+
+    def volatility(self, strike_price, exp_time):
+        '''Returns the volatilities (%) of arrays of strike prices and expiries (days)'''
+        K, days = np.broadcast_arrays(np.asarray(strike_price, dtype=float),
+                                      np.asarray(exp_time, dtype=float))
+        if not len(self.expiries):
+            raise ValueError('No converged quotes to build the surface from')
+
+        k = self._log_moneyness(K, days)
+        T = days / 365  # to years
+        times = self.expiries / 365
+
+        # total variance of every slice at k, made non-decreasing in time
+        w = _svi(k[..., None], self.a, self.b, self.rho, self.m, self.s)
+        w = np.maximum.accumulate(w, axis=-1)
+
+        j = np.clip(np.searchsorted(times, T), 1, len(times) - 1) if len(times) > 1 \
+            else np.zeros(T.shape, dtype=int)
+        i = np.maximum(j - 1, 0)
+        w_i = np.take_along_axis(w, i[..., None], -1)[..., 0]
+        w_j = np.take_along_axis(w, j[..., None], -1)[..., 0]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.clip((T - times[i]) / (times[j] - times[i]), 0.0, 1.0)
+            variance = np.where(
+                T <= times[0], w[..., 0] / times[0],
+                np.where(T >= times[-1], w[..., -1] / times[-1],
+                         (w_i + weight * (w_j - w_i)) / T))
+
+        return np.sqrt(np.maximum(variance, 0.0)) * 100  # to percents
+
+    def _log_moneyness(self, K, days):
+        '''log(K / F) with the forward F of generalised_bs.BS'''
+        r = self.risk_free_rate / 100  # to decimals
+        T = np.asarray(days, dtype=float) / 365  # to years
+        S = adjust_spot(self.spot_price, r, T, self.div_yield / 100,
+                        self.dividends, self.is_fut)[0]
+
+        return np.log(K / S) - r * T
+
+
+def _svi(k, a, b, rho, m, s):
+    '''Raw SVI total variance'''
+    return a + b * (rho * (k - m) + np.sqrt((k - m)**2 + s**2))
+
+
+def _fit_svi(k, w, T):
+    '''Returns [a, b, rho, m, s] of the SVI slice closest to the total variances w'''
+    if len(k) < MIN_QUOTES:
+        return [np.mean(w), 0.0, 0.0, 0.0, 1.0]
+
+    spread = max(np.ptp(k), 0.05)
+    m_grid = np.linspace(k.min(), k.max(), GRID_SIZE)
+    s_grid = np.geomspace(0.01, 2.0, GRID_SIZE) * spread
+
+    best, best_error = None, np.inf
+    for _ in range(PASSES):
+        m, s = [x.ravel() for x in np.meshgrid(m_grid, s_grid)]
+
+        y = (k - m[:, None]) / s[:, None]
+        X = np.stack([np.ones(y.shape), y, np.sqrt(y**2 + 1)], axis=-1)
+        XtX = np.einsum('gni,gnj->gij', X, X) + 1e-12 * np.eye(3)
+        coef = np.linalg.solve(XtX, np.einsum('gni,n->gi', X, w)[..., None])[..., 0]
+
+        # w = a + d * y + c * sqrt(y**2 + 1) with d = b * rho * s, c = b * s
+        a, d, c = coef.T
+        error = np.sum((np.einsum('gni,gi->gn', X, coef) - w)**2, axis=1)
+
+        # b >= 0, |rho| <= 1, non-negative variance, Roger Lee's wing bound
+        valid = (c > 0) & (np.abs(d) <= c) & \
+            (a + np.sqrt(np.maximum(c**2 - d**2, 0.0)) >= 0) & \
+            ((c + np.abs(d)) / s <= 4 / T)
+        if not np.any(valid):
+            break
+
+        g = np.argmin(np.where(valid, error, np.inf))
+        if error[g] < best_error:
+            best, best_error = [a[g], c[g] / s[g], d[g] / c[g], m[g], s[g]], error[g]
+
+        # next pass on a finer grid around the best point
+        dm, ds = m_grid[1] - m_grid[0], s_grid[1] / s_grid[0]
+        m_grid = np.linspace(m[g] - dm, m[g] + dm, GRID_SIZE)
+        s_grid = np.geomspace(s[g] / ds, s[g] * ds, GRID_SIZE)
+
+    if best is None:
+        return [np.mean(w), 0.0, 0.0, 0.0, 1.0]
+
+    return best